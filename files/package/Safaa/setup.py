@@ -26,6 +26,6 @@ setup(
     include_package_data=True,
     include_dirs=[],
     package_data={'': ['src/Safaa/models/*.pkl', 'src/Safaa/models/*.',
-                       'src/Safaa/configs/*']},
+                       'src/Safaa/configs/*', 'src/Safaa/configs/fast/*']},
     python_requires='>=3.6',
 )
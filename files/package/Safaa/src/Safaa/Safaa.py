@@ -4,72 +4,469 @@ SafaaAgent: A module for handling false positive detection in copyright notices.
 
 import os
 import re
-import spacy
-from joblib import load, dump 
-import pkg_resources
 import shutil
+import hashlib
+import functools
+import time
+import logging
+import threading
+from itertools import islice
+from collections import Counter
+from contextlib import contextmanager, ExitStack
+from Safaa.normalizer import TextNormalizer
 
 # Constants
-DEFAULT_MODEL_DIR = pkg_resources.resource_filename(__name__, 'models')
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_DIR = os.path.join(PACKAGE_DIR, 'models')
 LOCAL_MODEL_DIR = '/home/fossy/Safaa'
-CONFIGS_DIR = pkg_resources.resource_filename(__name__, 'configs')
+CONFIGS_DIR = os.path.join(PACKAGE_DIR, 'configs')
+# The lighter models of the 'fast' variant live in this subdirectory of a model directory
+FAST_MODEL_DIR = 'fast'
+
+# The models of an agent, in the order they are loaded and fingerprinted
+MODEL_NAMES = ('false_positive_detector', 'vectorizer', 'entity_recognizer', 'declutter_model')
+
+# Per-epoch reporters of the running NER trainings, keyed by the id passed through their training config
+_EPOCH_REPORTERS = {}
+
+class _LazyModel:
+    """
+    Descriptor for a SafaaAgent model that is only loaded the first time it is used.
+
+    spaCy, joblib and scikit-learn are imported by the loaders, so importing this
+    module and constructing an agent stay cheap.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, agent, owner=None):
+        if agent is None:
+            return self
+        return agent._get_model(self.name)
+
+    def __set__(self, agent, model):
+        agent._active_state().models[self.name] = model
+        agent._models_changed()
+
+class _ModelPath:
+    """
+    Descriptor for the file path of a SafaaAgent model, stored with the models loaded from it.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name[:-len('_path')]
+
+    def __get__(self, agent, owner=None):
+        if agent is None:
+            return self
+        return agent._active_state().paths[self.name]
+
+    def __set__(self, agent, path):
+        agent._active_state().paths[self.name] = path
+
+class _ModelState:
+    """
+    One set of SafaaAgent models: their file paths, the models loaded so far and what is derived from them.
+
+    A reload builds a new state and swaps it in whole, so a call that started with one
+    state never mixes in models of another.
+    """
+
+    def __init__(self, paths, models=None):
+        self.paths = paths
+        self.models = models if models is not None else {}
+        # Fingerprint of the model files, computed on first use
+        self.fingerprint = None
+        # Number of in-memory changes to the models since they were loaded, under an id unique to this state
+        self.generation = 0
+        self.generation_id = None
+        # Whether both spaCy pipelines share the same tokenizer and tok2vec weights, checked on first use
+        self.tok2vec_shared = None
+
+def _pin_models(method):
+    """
+    Decorator that pins the agent's current models for the duration of a call.
+
+    Nested calls reuse the outer pin, so a reload in the middle of a call only takes
+    effect for the calls that start after it.
+    """
+
+    @functools.wraps(method)
+    def wrapper(agent, *args, **kwargs):
+        if getattr(agent._pinned, 'state', None) is not None:
+            return method(agent, *args, **kwargs)
+        agent._pinned.state = agent._state
+        try:
+            return method(agent, *args, **kwargs)
+        finally:
+            agent._pinned.state = None
+    return wrapper
 
 class SafaaAgent:
-    def __init__(self, use_local_model=True, model_dir=None):
+    # The models, loaded lazily from their file paths
+    false_positive_detector = _LazyModel()
+    vectorizer = _LazyModel()
+    entity_recognizer = _LazyModel()
+    declutter_model = _LazyModel()
+
+    # The file paths the models are loaded from
+    false_positive_detector_path = _ModelPath()
+    vectorizer_path = _ModelPath()
+    entity_recognizer_path = _ModelPath()
+    declutter_model_path = _ModelPath()
+
+    def __init__(self, use_local_model=True, model_dir=None, batch_size=1000, n_process=1, cache=None,
+                 stage_callback=None, model_format='auto', feature_extraction='tfidf', n_features=2 ** 20,
+                 result_store=None, max_length=None, overflow='truncate', rules=None, model_variant='accurate'):
             """
             Initializes the SafaaAgent with the necessary models.
 
             Parameters:
             use_local_model (bool): Flag to use local models if available.
-            model_dir (str): Custom directory path for models. Defaults to None.
+            model_dir (str): Custom directory path for models, or the root of a ModelRegistry whose active
+                version is used. Defaults to None.
+            batch_size (int): Number of strings sent through the spaCy pipelines at once. Defaults to 1000.
+            n_process (int): Number of processes used by spaCy's nlp.pipe. Defaults to 1.
+            cache (PredictionCache): Opt-in cache for the results of predict and declutter. Defaults to None.
+            stage_callback (callable): Called as stage_callback(stage, seconds, size) after each pipeline stage. Defaults to None.
+            model_format (str): 'pickle' or 'mmap' for the False Positive Detector and the Vectorizer, or 'auto' to
+                use the memory-mapped artifacts when they exist. Defaults to 'auto'.
+            feature_extraction (str): 'tfidf' for the fitted TF-IDF vectorizer or 'hashing' for a stateless
+                hashing vectorizer that needs no vocabulary. Defaults to 'tfidf'.
+            n_features (int): Number of hashed features when feature_extraction is 'hashing'. Defaults to 2 ** 20.
+            result_store (ResultStore): Persistent store of analyze results used by update. Defaults to None.
+            max_length (int): Maximum number of characters of a string, or None for no limit. Defaults to None.
+            overflow (str): What happens to strings longer than max_length. 'truncate' keeps their first
+                max_length characters. 'skip' does not process them at all: they are predicted as false
+                positives ('f') with a probability of 1.0 and decluttered to an empty string. Defaults to 'truncate'.
+            rules (RuleClassifier): Rules that decide obvious strings before the models, with a false positive
+                probability of 1.0 for 'f' and 0.0 for 't'. Defaults to None.
+            model_variant (str): 'accurate' for the models of the model directory, or 'fast' for the lighter
+                models exported into its 'fast' subdirectory by Safaa.export. Defaults to 'accurate'.
             """
-            
+
+            # Default batching options for the spaCy pipelines
+            self.batch_size = batch_size
+            self.n_process = n_process
+
+            # Guard against pathological strings, e.g. binary garbage or whole license texts
+            if overflow not in ('truncate', 'skip'):
+                raise ValueError(f"Unknown overflow behavior: {overflow!r}")
+            self.max_length = max_length
+            self.overflow = overflow
+
+            # Optional rules that short-circuit obvious strings, and the number of strings each stage decided
+            self.rules = rules
+            self.decisions = Counter()
+
+            # Precompiled normalizer used for the text substitutions
+            self.text_normalizer = TextNormalizer()
+
+            # Optional hook that receives the wall time of every pipeline stage
+            self.stage_callback = stage_callback
+
+            # Optional cache for repeated strings, keyed on the fingerprint of the models
+            self.cache = cache
+
+            # Optional persistent store that lets update rescore only the strings it has not seen
+            self.result_store = result_store
+
+            # The hashing vectorizer is built from these options instead of being loaded from the vectorizer path
+            if feature_extraction not in ('tfidf', 'hashing'):
+                raise ValueError(f"Unknown feature extraction: {feature_extraction!r}")
+            self.feature_extraction = feature_extraction
+            self.n_features = n_features
+
             # Determine the model directory based on the provided arguments
             model_dir = model_dir if model_dir else (LOCAL_MODEL_DIR if use_local_model and os.path.exists(LOCAL_MODEL_DIR) else DEFAULT_MODEL_DIR)
-            
-            # Construct the file paths for each model
-            self.false_positive_detector_path = os.path.join(model_dir, 'false_positive_detection_model.pkl')
-            self.vectorizer_path = os.path.join(model_dir, 'false_positive_detection_vectorizer.pkl')
-            self.entity_recognizer_path = os.path.join(model_dir, 'entity_recognizer')
-            self.declutter_model_path = os.path.join(model_dir, 'declutter_model')
-            
-            # Load the models from the constructed file paths
-            self._load_models()
+
+            # A registry root resolves to its active version, which reload picks up again
+            from Safaa.registry import ModelRegistry
+            self.registry = ModelRegistry(model_dir) if ModelRegistry.is_registry(model_dir) else None
+            self.model_dir = self.registry.current_path() if self.registry else model_dir
+
+            # Prefer the memory-mapped artifacts, which load instantly and are shared between processes
+            if model_format not in ('auto', 'pickle', 'mmap'):
+                raise ValueError(f"Unknown model format: {model_format!r}")
+            self.model_format = model_format
+
+            # The fast variant swaps in the exported lighter models of the same model directory
+            if model_variant not in ('accurate', 'fast'):
+                raise ValueError(f"Unknown model variant: {model_variant!r}")
+            self.model_variant = model_variant
+            if model_variant == 'fast' and not os.path.isdir(os.path.join(self.model_dir, FAST_MODEL_DIR)):
+                raise FileNotFoundError(
+                    f"No fast models in {self.model_dir}; export them with python -m Safaa export"
+                )
+
+            # The models are loaded from the constructed file paths on first use
+            self._state = _ModelState(self._model_paths(self.model_dir))
+            self._pinned = threading.local()
+            self._load_lock = threading.Lock()
+
+    def _model_paths(self, model_dir):
+        """
+        Constructs the file paths of every model in a model directory.
+
+        Parameters:
+        model_dir (str): The model directory.
+
+        Returns:
+        dict: The file path of each model, by name.
+        """
+
+        if self.model_variant == 'fast':
+            model_dir = os.path.join(model_dir, FAST_MODEL_DIR)
+
+        model_format = self.model_format
+        if model_format == 'auto':
+            mmap_exists = os.path.isdir(os.path.join(model_dir, 'false_positive_detection_model.mmap'))
+            model_format = 'mmap' if mmap_exists else 'pickle'
+        extension = 'mmap' if model_format == 'mmap' else 'pkl'
+
+        return {
+            'false_positive_detector': os.path.join(model_dir, f'false_positive_detection_model.{extension}'),
+            'vectorizer': os.path.join(model_dir, f'false_positive_detection_vectorizer.{extension}'),
+            'entity_recognizer': os.path.join(model_dir, 'entity_recognizer'),
+            'declutter_model': os.path.join(model_dir, 'declutter_model'),
+        }
+
+    def _active_state(self):
+        """
+        Returns the models pinned by the running call, or the current models outside of a call.
+        """
+
+        state = getattr(self._pinned, 'state', None)
+        return state if state is not None else self._state
+
+    def reload(self, wait=False):
+        """
+        Loads the latest models in the background and swaps them in once they are all loaded.
+
+        With a model registry the active version is resolved again, otherwise the models
+        are reloaded from the same directory. Calls in flight keep using the models they
+        started with, and keep being served while the new models load.
+
+        Parameters:
+        wait (bool): Whether to wait until the new models are swapped in. Defaults to False.
+
+        Returns:
+        threading.Thread: The thread loading the new models.
+        """
+
+        model_dir = self.registry.current_path() if self.registry else self.model_dir
+        state = _ModelState(self._model_paths(model_dir))
+        errors = []
+
+        def load():
+            try:
+                for name in MODEL_NAMES:
+                    state.models[name] = self._load_model(name, state.paths[name])
+            except Exception as error:
+                # Keep serving the old models
+                logging.getLogger('Safaa').exception("Reloading the models from %s failed", model_dir)
+                errors.append(error)
+                return
+            self.model_dir = model_dir
+            self._state = state
+
+        thread = threading.Thread(target=load, name='safaa-reload', daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+            if errors:
+                raise errors[0]
+        return thread
     
     def _load_models(self):
         """
-        Loads models from file paths.
+        Loads every model from its file path now instead of on first use.
+        """
+
+        for name in MODEL_NAMES:
+            self._get_model(name)
+
+    def _get_model(self, name):
+        """
+        Returns a model, loading it from its file path if it has not been loaded yet.
+
+        Parameters:
+        name (str): The name of the model, e.g. 'entity_recognizer'.
+
+        Returns:
+        object: The loaded model.
+        """
+
+        state = self._active_state()
+        model = state.models.get(name)
+        if model is None:
+            with self._load_lock:
+                # Another thread may have loaded the model while waiting for the lock
+                model = state.models.get(name)
+                if model is None:
+                    model = self._load_model(name, state.paths[name])
+                    state.models[name] = model
+        return model
+
+    def _load_model(self, name, path, check_features=True):
+        """
+        Loads a single model from its file path.
+
+        Parameters:
+        name (str): The name of the model, e.g. 'entity_recognizer'.
+        path (str): The file path of the model.
+        check_features (bool): Whether to check that the false positive detector takes the features of
+            the hashing vectorizer. Defaults to True.
+
+        Returns:
+        object: The loaded model.
+
+        Raises:
+        ValueError: If the false positive detector does not take the features of the hashing vectorizer.
+        """
+
+        # The hashing vectorizer is stateless, so there is nothing to load
+        if name == 'vectorizer' and self.feature_extraction == 'hashing':
+            return make_hashing_vectorizer(self.n_features)
+
+        # The False Positive Detector and the Vectorizer are memory-mapped artifacts or joblib pickles
+        if name in ('false_positive_detector', 'vectorizer'):
+            if os.path.isdir(path):
+                from Safaa.artifacts import load_artifact
+                model = load_artifact(path)
+            else:
+                from joblib import load
+                model = load(path)
+
+            # A detector trained on the TF-IDF vocabulary cannot score hashed features
+            n_features_in = getattr(model, 'n_features_in_', None)
+            if (check_features and name == 'false_positive_detector' and self.feature_extraction == 'hashing'
+                    and n_features_in not in (None, self.n_features)):
+                raise ValueError(
+                    f"The false positive detector in {path} takes {n_features_in} features, but the hashing vectorizer "
+                    f"produces {self.n_features}; retrain it with feature_extraction='hashing' and n_features={self.n_features}"
+                )
+            return model
+
+        # The Entity Recognizer and the Declutter model are spaCy pipelines; resolve an installed
+        # model's symlink once, so all its files come from the same install
+        import spacy
+        return spacy.load(os.path.realpath(path))
+
+    @contextmanager
+    def _timed_stage(self, stage, size):
+        """
+        Internal context manager that reports the wall time of a pipeline stage to the stage callback.
+
+        Parameters:
+        stage (str): The name of the stage, e.g. 'entity_masking'.
+        size (int): The number of strings processed by the stage.
+        """
+
+        if self.stage_callback is None:
+            yield
+            return
+        start = time.perf_counter()
+        yield
+        self.stage_callback(stage, time.perf_counter() - start, size)
+
+    def _model_fingerprint(self):
+        """
+        Computes a fingerprint of the model files from their paths, sizes and modification times.
+
+        Returns:
+        str: The hex digest identifying the current model files.
+        """
+
+        state = self._active_state()
+        if state.fingerprint is None:
+            digest = hashlib.sha256()
+            digest.update(f'{self.feature_extraction}:{self.n_features}:{self.max_length}:{self.overflow}\n'.encode('utf-8'))
+            for model_path in [state.paths[name] for name in MODEL_NAMES]:
+                # spaCy models are directories, so include every file inside them
+                file_paths = [model_path]
+                if os.path.isdir(model_path):
+                    file_paths = sorted(
+                        os.path.join(root, name)
+                        for root, _, names in os.walk(model_path) for name in names
+                    )
+                for file_path in file_paths:
+                    stat = os.stat(file_path)
+                    digest.update(f'{file_path}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode('utf-8'))
+            if self.rules is not None:
+                digest.update(f'rules:{self.rules.fingerprint()}\n'.encode('utf-8'))
+            # Models changed in memory, e.g. retrained, no longer match their files
+            if state.generation:
+                digest.update(f'generation:{state.generation_id}:{state.generation}\n'.encode('utf-8'))
+            state.fingerprint = digest.hexdigest()
+        return state.fingerprint
+
+    def _models_changed(self):
+        """
+        Internal helper that records an in-memory change to the models, so cached and stored results are not reused.
+        """
+
+        state = self._active_state()
+        if state.generation_id is None:
+            import uuid
+            state.generation_id = uuid.uuid4().hex
+        state.generation += 1
+        state.fingerprint = None
+
+    def _cached(self, kind, data, compute, options=''):
         """
+        Internal helper that answers repeated strings from the cache.
 
-        # Load the False Positive Detector model
-        self.false_positive_detector = load(self.false_positive_detector_path)
+        Each unique string is looked up once, and only the strings missing from the
+        cache are passed to compute, in a single batch.
 
-        # Load the Vectorizer model
-        self.vectorizer = load(self.vectorizer_path)
+        Parameters:
+        kind (str): The kind of result being cached, e.g. 'predict'.
+        data (list): A list of strings.
+        compute (callable): Computes the results of a list of strings.
+        options (str): Options the results depend on, e.g. the threshold. Defaults to ''.
+
+        Returns:
+        list: The results in the order of the data.
+        """
 
-        # Load the Entity Recognizer model using spaCy
-        self.entity_recognizer = spacy.load(self.entity_recognizer_path)
+        fingerprint = f'{self._model_fingerprint()}:{kind}:{options}'
 
-        # Load the Declutter model using spaCy
-        self.declutter_model = spacy.load(self.declutter_model_path)
+        # Dedupe the batch and look up every unique string
+        keys = {sentence: self.cache.make_key(sentence, fingerprint) for sentence in dict.fromkeys(data)}
+        found = self.cache.get_many(list(keys.values()))
+        results = {sentence: found[key] for sentence, key in keys.items() if key in found}
 
+        # Compute the missing strings and store them in the cache
+        missing = [sentence for sentence in keys if sentence not in results]
+        if missing:
+            computed = dict(zip(missing, compute(missing)))
+            self.cache.set_many({keys[sentence]: value for sentence, value in computed.items()})
+            results.update(computed)
 
-    def preprocess_data(self, data):
+        return [results[sentence] for sentence in data]
+
+
+    @_pin_models
+    def preprocess_data(self, data, batch_size=None, n_process=None):
         """
         Preprocesses the given data by performing various text cleaning and transformation tasks.
 
         Parameters:
         data (iterable): The data to preprocess.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
 
         Returns:
         data (list): List of preprocessed strings.
         """
 
-        # Ensure the data is a list of strings
-        data = self._ensure_list_of_strings(data)
+        # Ensure the data is a list of strings within the length limit
+        data, _ = self._limit_length(self._ensure_list_of_strings(data))
 
         # Replace copyright holder entities in the data
-        data = self._replace_entities(data)
+        data = self._replace_entities(data, batch_size=batch_size, n_process=n_process)
 
         # Perform text substitutions for dates, numbers, symbols, emails, etc.
         data = self._perform_text_substitutions(data)
@@ -80,7 +477,8 @@ class SafaaAgent:
         """
         Ensures the data is a list of strings.
 
-        If the input data is not a list, attempts to convert it to a list.
+        If the input data is not a list, attempts to convert it to a list, using
+        to_list for pandas objects and consuming any other iterable.
         Then, ensures each element of the list is a string.
 
         Parameters:
@@ -92,36 +490,146 @@ class SafaaAgent:
 
         # If data is not a list, try converting it to a list
         if not isinstance(data, list):
-            data = data.to_list()
+            data = data.to_list() if hasattr(data, 'to_list') else list(data)
         # Ensure each item in the list is a string
         return [str(item) for item in data]
     
-    def _replace_entities(self, data):
+    def _limit_length(self, data):
+        """
+        Applies the max_length limit to a list of strings.
+
+        Parameters:
+        data (list): A list of strings.
+
+        Returns:
+        tuple: The strings within the limit, with skipped strings replaced by an empty
+            string, and the set of indices of the skipped strings.
+        """
+
+        if self.max_length is None:
+            return data, set()
+
+        if self.overflow == 'skip':
+            skipped = {index for index, sentence in enumerate(data) if len(sentence) > self.max_length}
+            return ['' if index in skipped else sentence for index, sentence in enumerate(data)], skipped
+        return [sentence[:self.max_length] for sentence in data], set()
+
+    def _decide(self, data):
+        """
+        Internal helper that decides the strings that do not need the models.
+
+        Strings skipped for their length are false positives, then the rules, if any,
+        decide the obvious strings. The number of strings decided by each stage is
+        added to the decisions counter.
+
+        Parameters:
+        data (list): A list of strings.
+
+        Returns:
+        tuple: The strings within the length limit, and a dict of the (prediction, false positive
+            probability) of each decided string, by index.
+        """
+
+        data, skipped = self._limit_length(data)
+        decided = {index: ('f', 1.0) for index in skipped}
+        counts = Counter(length=len(skipped))
+
+        if self.rules is not None:
+            with self._timed_stage('rules', len(data) - len(skipped)):
+                for index, decision in enumerate(self.rules.decide(data)):
+                    if decision is None or index in skipped:
+                        continue
+                    verdict, rule = decision
+                    decided[index] = (verdict, 1.0 if verdict == 'f' else 0.0)
+                    counts[rule] += 1
+
+        counts['model'] = len(data) - len(decided)
+        self.decisions.update(counts)
+        return data, decided
+
+    def decision_fractions(self):
+        """
+        Reports which stage decided the strings predicted so far.
+
+        Returns:
+        dict: The fraction of strings decided by each stage: 'length' for strings skipped for their
+            length, 'exact', 'pattern' and 'empty' for the rules, and 'model' for the models.
+        """
+
+        total = sum(self.decisions.values())
+        return {stage: count / total for stage, count in self.decisions.items() if count} if total else {}
+
+    def _pipe_by_length(self, nlp, data, process=None, batch_size=None, n_process=None):
+        """
+        Internal helper that runs strings through a spaCy pipeline in batches of similar length.
+
+        Sorting the strings by length before nlp.pipe evens out the work of every batch,
+        so a few long strings do not stall batches of short ones. The results are put
+        back in input order.
+
+        Parameters:
+        nlp (Language): The spaCy pipeline.
+        data (list): A list of strings.
+        process (callable): Turns each document into its result, so documents do not have to be kept. Defaults to None.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
+
+        Returns:
+        list: The result of each string, or its document if no process is given, in input order.
+        """
+
+        order = sorted(range(len(data)), key=lambda index: len(data[index]))
+        docs = nlp.pipe(
+            (data[index] for index in order),
+            batch_size=batch_size or self.batch_size,
+            n_process=n_process or self.n_process
+        )
+        results = [None] * len(data)
+        for index, doc in zip(order, docs):
+            results[index] = process(doc) if process else doc
+        return results
+
+    def _replace_entities(self, data, batch_size=None, n_process=None):
         """
         Replaces detected copyright holder entities with ' ENTITY '.
 
         Uses the entity_recognizer model to identify copyright holder entities,
         which are often name or organization entities, and replaces them with 
-        the string ' ENTITY '.
+        the string ' ENTITY '. The strings are streamed through the model in
+        batches of similar length using nlp.pipe.
 
         Parameters:
         data (list): A list of strings.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
 
         Returns:
         list: A list of strings with copyright holder entities replaced.
         """
 
-        new_data = []
-        for sentence in data:
-            # Process the sentence using the entity recognizer
-            doc = self.entity_recognizer(sentence)
-            new_sentence = doc.text
-            for entity in doc.ents:
-                # If the entity is a copyright holder entity, replace it with ' ENTITY '
-                if entity.label_ == 'ENT':
-                    new_sentence = re.sub(re.escape(entity.text), ' ENTITY ', new_sentence)
-            new_data.append(new_sentence)
-        return new_data
+        with self._timed_stage('entity_masking', len(data)):
+            # Process the sentences in batches using the entity recognizer
+            return self._pipe_by_length(
+                self.entity_recognizer, data, self._mask_entities, batch_size=batch_size, n_process=n_process
+            )
+
+    def _mask_entities(self, doc):
+        """
+        Replaces the copyright holder entities of a processed document with ' ENTITY '.
+
+        Parameters:
+        doc (Doc): A document processed by the entity_recognizer model.
+
+        Returns:
+        str: The document text with copyright holder entities replaced.
+        """
+
+        new_sentence = doc.text
+        for entity in doc.ents:
+            # If the entity is a copyright holder entity, replace it with ' ENTITY '
+            if entity.label_ == 'ENT':
+                new_sentence = re.sub(re.escape(entity.text), ' ENTITY ', new_sentence)
+        return new_sentence
 
     
     def _perform_text_substitutions(self, data):
@@ -144,51 +652,95 @@ class SafaaAgent:
         list: A list of cleaned and standardized strings.
         """
 
-        # Define the substitution patterns and their replacements
-        subs = [
-            (r'\d{4}', ' DATE '),
-            (r'\d+', ' '),
-            (r'©', ' COPYRIGHTSYMBOL '),
-            (r'\(c\)', ' COPYRIGHTSYMBOL '),
-            (r'\(C\)', ' COPYRIGHTSYMBOL '),
-            (r"""(?:[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*|"(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21\x23-\x5b\x5d-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])*")@(?:(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?|\[(?:(?:(2(5[0-5]|[0-4][0-9])|1[0-9][0-9]|[1-9]?[0-9]))\.){3}(?:(2(5[0-5]|[0-4][0-9])|1[0-9][0-9]|[1-9]?[0-9])|[a-z0-9-]*[a-z0-9]:(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21-\x5a\x53-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])+)\])""", ' EMAIL '),
-            (r'[^a-zA-Z0-9]', ' ')
-        ]
-        # Perform the substitutions for each pattern in the list
-        for pattern, replacement in subs:
-            data = [re.sub(pattern, replacement, sentence) for sentence in data]
-        # Convert text to lowercase and strip extra whitespace
-        return [sentence.lower().strip() for sentence in data]
+        with self._timed_stage('normalization', len(data)):
+            # Run the precompiled normalizer over every string
+            return self.text_normalizer(data)
     
-    def predict(self, data, threshold=0.5):
+    @_pin_models
+    def predict(self, data, threshold=0.5, batch_size=None, n_process=None):
         """
         Predicts false positives in the given data.
 
         Parameters:
         data (iterable): The data to predict.
         threshold (float): The probability threshold for classification. Defaults to 0.5.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
 
         Returns:
         list: The predictions.
         """
 
-        # Preprocess the data before making predictions
-        data = self.preprocess_data(data)
+        # Ensure the data is a list of strings
+        data = self._ensure_list_of_strings(data)
 
-        # Vectorize the preprocessed data using the pre-trained vectorizer
-        data = self.vectorizer.transform(data)
+        # Answer repeated strings from the cache if one is configured
+        if self.cache is not None:
+            return self._cached(
+                'predict', data, lambda missing: self._predict(missing, threshold, batch_size, n_process),
+                options=str(threshold)
+            )
+        return self._predict(data, threshold, batch_size, n_process)
 
-        # Check if the model supports probability prediction
-        if hasattr(self.false_positive_detector, 'predict_proba'):
-            # Get probability predictions from the model
-            predictions = self.false_positive_detector.predict_proba(data)
-            # Classify based on the given threshold. If the threshhold is not met, automatically sets the 
-            # prediction to true
-            return ['f' if prediction[1] >= threshold else 't' for prediction in predictions]
-        
-        # Get binary predictions from the model if probability prediction is not supported
-        return ['f' if prediction == 1 else 't' for prediction in self.false_positive_detector.predict(data)]
-        
+    def _predict(self, data, threshold, batch_size, n_process):
+        """
+        Internal helper that predicts false positives in a list of strings.
+
+        Parameters:
+        data (list): A list of strings.
+        threshold (float): The probability threshold for classification.
+        batch_size (int): Overrides the agent's spaCy batch size.
+        n_process (int): Overrides the agent's spaCy process count.
+
+        Returns:
+        list: The predictions.
+        """
+
+        # Decide what the rules and the length limit can, and preprocess only the other strings
+        data, decided = self._decide(data)
+        undecided = [index for index in range(len(data)) if index not in decided]
+        predictions = [None] * len(data)
+        for index, (prediction, _) in decided.items():
+            predictions[index] = prediction
+
+        if undecided:
+            preprocessed = self.preprocess_data([data[index] for index in undecided], batch_size=batch_size, n_process=n_process)
+
+            # Classify the preprocessed data and keep only the labels
+            for index, prediction in zip(undecided, self._classify(preprocessed, threshold)[0]):
+                predictions[index] = prediction
+        return predictions
+
+    def _classify(self, data, threshold):
+        """
+        Internal helper that classifies preprocessed strings.
+
+        Parameters:
+        data (list): A list of preprocessed strings.
+        threshold (float): The probability threshold for classification.
+
+        Returns:
+        tuple: The predictions and the false positive probability of each string.
+        """
+
+        with self._timed_stage('vectorization', len(data)):
+            # Vectorize the preprocessed data using the pre-trained vectorizer
+            data = self.vectorizer.transform(data)
+
+        with self._timed_stage('classification', data.shape[0]):
+            # Check if the model supports probability prediction
+            if hasattr(self.false_positive_detector, 'predict_proba'):
+                # Get probability predictions from the model
+                probabilities = [float(prediction[1]) for prediction in self.false_positive_detector.predict_proba(data)]
+                # Classify based on the given threshold. If the threshhold is not met, automatically sets the 
+                # prediction to true
+                return ['f' if probability >= threshold else 't' for probability in probabilities], probabilities
+            
+            # Get binary predictions from the model if probability prediction is not supported
+            probabilities = [1.0 if prediction == 1 else 0.0 for prediction in self.false_positive_detector.predict(data)]
+            return ['f' if probability == 1.0 else 't' for probability in probabilities], probabilities
+
+    @_pin_models
     def declutter(self, data, predictions):
         """
         Cleans up a copyright notice by removing extra text based on the predictions.
@@ -201,122 +753,816 @@ class SafaaAgent:
         list: The decluttered data.
         """
 
-        # Iterate over each sentence and its corresponding prediction
+        # Strings skipped for their length are decluttered like false positives
+        data, skipped = self._limit_length(self._ensure_list_of_strings(data))
+        predictions = ['f' if index in skipped else prediction for index, prediction in enumerate(predictions)]
+
+        # Only the sentences that are not marked as false positives need the declutter model
+        pairs = list(zip(data, predictions))
+        positives = [sentence for sentence, prediction in pairs if prediction != 'f']
+        if self.cache is not None:
+            decluttered = iter(self._cached('declutter', positives, self._declutter_sentences))
+        else:
+            decluttered = iter(self._declutter_sentences(positives))
+
         # Remove text from sentences marked as false positives, and keep the entities (copyrights) in other sentences
-        return [
-            '' if prediction == 'f' else ' '.join([ent.text for ent in self.declutter_model(sentence).ents])
-            for sentence, prediction in zip(data, predictions)
-        ]
+        return ['' if prediction == 'f' else next(decluttered) for _, prediction in pairs]
 
-    def train_false_positive_detector_model(self, data, labels):
+    def _declutter_sentences(self, data, batch_size=None, n_process=None):
+        """
+        Internal helper that keeps only the copyright entities of each sentence.
+
+        The sentences are streamed through the declutter model in batches of similar length using nlp.pipe.
+
+        Parameters:
+        data (list): A list of strings.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
+
+        Returns:
+        list: The decluttered strings.
+        """
+
+        with self._timed_stage('declutter', len(data)):
+            return self._pipe_by_length(
+                self.declutter_model, data, lambda doc: ' '.join([ent.text for ent in doc.ents]),
+                batch_size=batch_size, n_process=n_process
+            )
+
+    def _shares_tok2vec(self):
+        """
+        Checks whether the entity recognizer and the declutter model share their tokenizer and tok2vec layer.
+
+        When they do, the token vectors computed by the entity recognizer can be reused by
+        the declutter model instead of being computed a second time.
+
+        Returns:
+        bool: True if the tokenizer and tok2vec weights of both pipelines are identical.
+        """
+
+        state = self._active_state()
+        if state.tok2vec_shared is None:
+            entity_recognizer, declutter_model = self.entity_recognizer, self.declutter_model
+            state.tok2vec_shared = (
+                entity_recognizer.pipe_names[:1] == ['tok2vec']
+                and declutter_model.pipe_names[:1] == ['tok2vec']
+                and entity_recognizer.tokenizer.to_bytes(exclude=['vocab'])
+                == declutter_model.tokenizer.to_bytes(exclude=['vocab'])
+                and entity_recognizer.get_pipe('tok2vec').to_bytes(exclude=['vocab'])
+                == declutter_model.get_pipe('tok2vec').to_bytes(exclude=['vocab'])
+            )
+        return state.tok2vec_shared
+
+    def _declutter_docs(self, docs, batch_size=None):
+        """
+        Internal helper that declutters documents already processed by the entity recognizer.
+
+        Reuses the tokens and token vectors of the documents, so only the components after
+        the shared tok2vec layer of the declutter model are run.
+
+        Parameters:
+        docs (list): Documents processed by the entity_recognizer model.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+
+        Returns:
+        list: The decluttered strings.
+        """
+
+        from spacy.tokens import Doc
+
+        with self._timed_stage('declutter', len(docs)):
+            # Copy the tokens and token vectors into fresh documents of the declutter model's vocab
+            new_docs = []
+            for doc in docs:
+                new_doc = Doc(
+                    self.declutter_model.vocab,
+                    words=[token.text for token in doc],
+                    spaces=[bool(token.whitespace_) for token in doc]
+                )
+                new_doc.tensor = doc.tensor
+                new_docs.append(new_doc)
+
+            # Run every component after the shared tok2vec layer
+            for _, component in self.declutter_model.pipeline[1:]:
+                new_docs = component.pipe(new_docs, batch_size=batch_size or self.batch_size)
+            return [' '.join([ent.text for ent in doc.ents]) for doc in new_docs]
+
+    @_pin_models
+    def analyze(self, data, threshold=0.5, batch_size=None, n_process=None):
+        """
+        Predicts false positives and declutters the true positives in a single call.
+
+        Equivalent to calling predict followed by declutter, but the declutter model only
+        sees the strings predicted as true positives, in batches, and reuses the token
+        vectors of the entity recognizer when both models share their tok2vec layer.
+
+        Parameters:
+        data (iterable): The data to analyze.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
+
+        Returns:
+        list: A (prediction, false positive probability, decluttered text) tuple for each string.
+        """
+
+        # Ensure the data is a list of strings
+        data = self._ensure_list_of_strings(data)
+
+        # Answer repeated strings from the cache if one is configured
+        if self.cache is not None:
+            results = self._cached(
+                'analyze', data, lambda missing: self._analyze(missing, threshold, batch_size, n_process),
+                options=str(threshold)
+            )
+            return [tuple(result) for result in results]
+        return self._analyze(data, threshold, batch_size, n_process)
+
+    def _analyze(self, data, threshold, batch_size, n_process):
+        """
+        Internal helper that predicts and declutters a list of strings.
+
+        Parameters:
+        data (list): A list of strings.
+        threshold (float): The probability threshold for classification.
+        batch_size (int): Overrides the agent's spaCy batch size.
+        n_process (int): Overrides the agent's spaCy process count.
+
+        Returns:
+        list: A (prediction, false positive probability, decluttered text) tuple for each string.
+        """
+
+        shares_tok2vec = self._shares_tok2vec()
+
+        # Decide what the rules and the length limit can, and send only the other strings through the models
+        data, decided = self._decide(data)
+        undecided = [index for index in range(len(data)) if index not in decided]
+        sentences = [data[index] for index in undecided]
+        predictions, probabilities = [None] * len(data), [None] * len(data)
+        for index, (prediction, probability) in decided.items():
+            predictions[index], probabilities[index] = prediction, probability
+
+        docs = {}
+        if sentences:
+            with self._timed_stage('entity_masking', len(sentences)):
+                # Run the entity recognizer once, keeping the documents only if the declutter model can reuse them
+                if shares_tok2vec:
+                    docs = dict(zip(undecided, self._pipe_by_length(
+                        self.entity_recognizer, sentences, batch_size=batch_size, n_process=n_process
+                    )))
+                    masked = [self._mask_entities(docs[index]) for index in undecided]
+                else:
+                    masked = self._pipe_by_length(
+                        self.entity_recognizer, sentences, self._mask_entities, batch_size=batch_size, n_process=n_process
+                    )
+            preprocessed = self._perform_text_substitutions(masked)
+
+            # Classify the preprocessed data
+            for index, prediction, probability in zip(undecided, *self._classify(preprocessed, threshold)):
+                predictions[index], probabilities[index] = prediction, probability
+
+        # Declutter only the true positives, reusing the documents of the entity recognizer where there are any
+        positives = [index for index, prediction in enumerate(predictions) if prediction != 'f']
+        with_docs = [index for index in positives if index in docs]
+        without_docs = [index for index in positives if index not in docs]
+        decluttered = {}
+        if shares_tok2vec:
+            decluttered.update(zip(with_docs, self._declutter_docs([docs[index] for index in with_docs], batch_size=batch_size)))
+        if without_docs or not shares_tok2vec:
+            decluttered.update(zip(without_docs, self._declutter_sentences(
+                [data[index] for index in without_docs], batch_size=batch_size, n_process=n_process
+            )))
+
+        # Sentences marked as false positives are decluttered to an empty string
+        texts = [decluttered.get(index, '') for index in range(len(data))]
+        return list(zip(predictions, probabilities, texts))
+
+    @_pin_models
+    def update(self, data, threshold=0.5, batch_size=None, n_process=None):
+        """
+        Analyzes a rescanned set of strings, computing only the strings missing from the result store.
+
+        The stored results are dropped automatically when the model files or the
+        threshold change, so every returned result comes from the current models.
+
+        Parameters:
+        data (iterable): The full set of strings, e.g. every copyright finding of an upload.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
+
+        Returns:
+        list: A (prediction, false positive probability, decluttered text) tuple for each string.
+
+        Raises:
+        ValueError: If the agent has no result store.
+        """
+
+        if self.result_store is None:
+            raise ValueError("update requires a result_store")
+
+        # Ensure the data is a list of strings
+        data = self._ensure_list_of_strings(data)
+
+        # Invalidate the stored results if the models or the threshold changed since the last run
+        self.result_store.sync(f'{self._model_fingerprint()}:{threshold}')
+
+        # Look up every unique string and analyze only the new ones in a single batch
+        keys = {sentence: self.result_store.make_key(sentence) for sentence in dict.fromkeys(data)}
+        found = self.result_store.get_many(list(keys.values()))
+        results = {sentence: found[key] for sentence, key in keys.items() if key in found}
+
+        missing = [sentence for sentence in keys if sentence not in results]
+        if missing:
+            computed = dict(zip(missing, self._analyze(missing, threshold, batch_size, n_process)))
+            self.result_store.set_many({keys[sentence]: value for sentence, value in computed.items()})
+            results.update(computed)
+
+        return [results[sentence] for sentence in data]
+
+    def predict_iter(self, data, threshold=0.5, chunk_size=10000, batch_size=None, n_process=None):
+        """
+        Lazily predicts false positives in an iterable of any size.
+
+        The input, e.g. a file handle, a database cursor or a generator over CSV chunks, is
+        consumed chunk_size strings at a time, so peak memory is bounded by the chunk size
+        rather than by the size of the input. Every chunk runs in a spaCy memory zone, so
+        the strings and lexemes it adds to the vocab of the pipelines are freed after it.
+
+        Parameters:
+        data (iterable): The data to predict.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+        chunk_size (int): Number of strings processed at a time. Defaults to 10000.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
+
+        Yields:
+        str: The prediction of each string, in input order.
+        """
+
+        for chunk in self._chunks(data, chunk_size):
+            yield from self._in_memory_zone(
+                self.predict, chunk, threshold=threshold, batch_size=batch_size, n_process=n_process
+            )
+
+    def declutter_iter(self, data, predictions, chunk_size=10000):
+        """
+        Lazily declutters an iterable of any size.
+
+        Parameters:
+        data (iterable): The data to declutter.
+        predictions (iterable): The predictions indicating false positives, e.g. from predict_iter.
+        chunk_size (int): Number of strings processed at a time. Defaults to 10000.
+
+        Yields:
+        str: The decluttered text of each string, in input order.
+        """
+
+        for chunk in self._chunks(zip(data, predictions), chunk_size):
+            sentences, chunk_predictions = zip(*chunk)
+            yield from self._in_memory_zone(self.declutter, list(sentences), list(chunk_predictions))
+
+    def analyze_iter(self, data, threshold=0.5, chunk_size=10000, batch_size=None, n_process=None):
+        """
+        Lazily predicts and declutters an iterable of any size.
+
+        Parameters:
+        data (iterable): The data to analyze.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+        chunk_size (int): Number of strings processed at a time. Defaults to 10000.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
+
+        Yields:
+        tuple: The (prediction, false positive probability, decluttered text) of each string, in input order.
+        """
+
+        for chunk in self._chunks(data, chunk_size):
+            yield from self._in_memory_zone(
+                self.analyze, chunk, threshold=threshold, batch_size=batch_size, n_process=n_process
+            )
+
+    @_pin_models
+    def _in_memory_zone(self, method, *args, **kwargs):
+        """
+        Internal helper that runs a method inside a memory zone of both spaCy pipelines.
+
+        Without a memory zone every unseen token stays in the vocab and string store of a
+        pipeline for good, so memory would grow with the number of distinct strings
+        streamed. The results are plain strings and numbers, so they outlive the zone.
+        Older spaCy versions without memory zones run the method as is.
+
+        Parameters:
+        method (callable): The method to run, e.g. self.predict.
+        args: Positional arguments of the call.
+        kwargs: Keyword arguments of the call.
+
+        Returns:
+        list: The results of the call.
+        """
+
+        with ExitStack() as stack:
+            for nlp in (self.entity_recognizer, self.declutter_model):
+                if hasattr(nlp, 'memory_zone'):
+                    stack.enter_context(nlp.memory_zone())
+            return list(method(*args, **kwargs))
+
+    @staticmethod
+    def _chunks(data, chunk_size):
+        """
+        Internal helper that splits an iterable into lists of at most chunk_size items.
+
+        Parameters:
+        data (iterable): The iterable to split.
+        chunk_size (int): The maximum number of items per chunk.
+
+        Yields:
+        list: The next chunk of items.
+        """
+
+        iterator = iter(data)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    @_pin_models
+    def train_false_positive_detector_model(self, data, labels, batch_size=None, n_process=None):
         """
         Trains the false positive detector model from scratch.
         
         Parameters:
         data (iterable): The data to train the model on.
         labels (iterable): The labels for the training data.
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
         """
 
         # Preprocess the data before training
-        preprocessed_data = self.preprocess_data(data)
+        preprocessed_data = self.preprocess_data(data, batch_size=batch_size, n_process=n_process)
+        # A memory-mapped vectorizer is read-only, so refit a scikit-learn one with the same parameters
+        if not hasattr(self.vectorizer, 'fit_transform'):
+            self.vectorizer = self.vectorizer.to_sklearn()
         # Fit the vectorizer to the preprocessed data
         vectorized_data = self.vectorizer.fit_transform(preprocessed_data)
-        # Train the false positive detector model
-        self.false_positive_detector.fit(vectorized_data, labels)
+        # Train the false positive detector model, which may have been trained on other features before
+        state = self._active_state()
+        detector = state.models.get('false_positive_detector')
+        if detector is None:
+            detector = self._load_model('false_positive_detector', state.paths['false_positive_detector'], check_features=False)
+        detector.fit(vectorized_data, labels)
+        # Install the fitted detector, which records that the models changed
+        self.false_positive_detector = detector
 
-    def train_ner_model(self, train_path, dev_path, declutter_model=False, config_path=None):
+    @_pin_models
+    def train_false_positive_detector_incrementally(self, csv_path, chunk_size=10000, classifier=None,
+                                                    checkpoint_path=None, text_column='text', label_column='label',
+                                                    classes=(0, 1), batch_size=None, n_process=None):
+        """
+        Trains the false positive detector model out of core, one chunk of a CSV file at a time.
+
+        Each chunk is preprocessed, vectorized with the stateless hashing vectorizer and
+        passed to the classifier's partial_fit, so memory stays bounded by the chunk size.
+        After every chunk the classifier is checkpointed, and an interrupted run resumes
+        after the last checkpointed chunk.
+
+        Parameters:
+        csv_path (str): The path to the labeled CSV file.
+        chunk_size (int): Number of rows read and trained on at a time. Defaults to 10000.
+        classifier (object): An estimator with partial_fit. Defaults to SGDClassifier(loss='log_loss').
+        checkpoint_path (str): The file to checkpoint to and resume from. Defaults to None.
+        text_column (str): The column holding the copyright strings. Defaults to 'text'.
+        label_column (str): The column holding the labels, 1 for false positives. Defaults to 'label'.
+        classes (tuple): Every label that can appear, required by partial_fit. Defaults to (0, 1).
+        batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+        n_process (int): Overrides the agent's spaCy process count. Defaults to None.
+
+        Raises:
+        ValueError: If the agent does not use the hashing vectorizer.
+        """
+
+        # A fitted vocabulary cannot grow chunk by chunk
+        if self.feature_extraction != 'hashing':
+            raise ValueError("Incremental training requires feature_extraction='hashing'")
+
+        import numpy as np
+        import pandas as pd
+        from joblib import dump, load
+
+        chunks_done = 0
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            # Resume from the classifier and position of the last checkpoint
+            checkpoint = load(checkpoint_path)
+            if checkpoint['chunk_size'] != chunk_size or checkpoint['n_features'] != self.n_features:
+                raise ValueError(f"The checkpoint at {checkpoint_path} was written with different options")
+            classifier = checkpoint['classifier']
+            chunks_done = checkpoint['chunks_done']
+        elif classifier is None:
+            from sklearn.linear_model import SGDClassifier
+            classifier = SGDClassifier(loss='log_loss')
+
+        reader = pd.read_csv(csv_path, usecols=[text_column, label_column], chunksize=chunk_size)
+        for chunk_index, chunk in enumerate(reader):
+            # Skip the chunks trained on before the checkpoint
+            if chunk_index < chunks_done:
+                continue
+
+            preprocessed_data = self.preprocess_data(chunk[text_column], batch_size=batch_size, n_process=n_process)
+            vectorized_data = self.vectorizer.transform(preprocessed_data)
+            classifier.partial_fit(vectorized_data, chunk[label_column].to_numpy(), classes=np.asarray(classes))
+
+            if checkpoint_path:
+                # Write the checkpoint next to the old one and swap it in atomically
+                tmp_checkpoint_path = f'{checkpoint_path}.tmp'
+                dump({'classifier': classifier, 'chunks_done': chunk_index + 1,
+                      'chunk_size': chunk_size, 'n_features': self.n_features}, tmp_checkpoint_path)
+                os.replace(tmp_checkpoint_path, checkpoint_path)
+
+        self.false_positive_detector = classifier
+
+    def train_ner_model(self, train_path, dev_path, declutter_model=False, config_path=None, output_dir=None,
+                        overrides=None, threads=None, batch_size=None, epoch_callback=None, use_gpu=-1):
         """
         Trains the named entity recognition model using the provided training and
         development datasets.
-        
+
+        Training runs in-process through spaCy's training API. The data paths and the
+        other options are applied as config overrides, the run writes to its own
+        temporary directory, and the best model is moved into place when it is done.
+
         Parameters:
-        train_path (str): The path to the training data file. Should be a .spacy file
-        dev_path (str): The path to the development data file. Should be a .spacy file
+        train_path (str): The path to the training data file. Should be a .spacy file or a directory of them.
+        dev_path (str): The path to the development data file. Should be a .spacy file or a directory of them.
         declutter_model (bool): Whether to train the declutter model or the entity recognizer model. Defaults to False.
-        config_path (str): The path to the configuration file. Defaults to None.
+        config_path (str): The path to the directory holding train.cfg. Defaults to None.
+        output_dir (str): The directory to install the trained model into. Defaults to LOCAL_MODEL_DIR.
+        overrides (dict): Extra config overrides, e.g. {'training.max_epochs': 10}. Defaults to None.
+        threads (int): Maximum number of threads used by the BLAS and OpenMP thread pools. Defaults to None.
+        batch_size (int): Overrides the number of words per training batch. Defaults to None.
+        epoch_callback (callable): Called after every epoch with a dict holding the epoch, its wall time in seconds,
+            its last step, and the score, per-metric scores and losses of its last evaluation, with a score of None
+            if it was not evaluated. Defaults to None.
+        use_gpu (int): The GPU to train on, or -1 for the CPU. Defaults to -1.
+
+        Returns:
+        list: The epoch dicts passed to epoch_callback, in order.
         """
 
-        # Determine the configuration file path
+        import tempfile
+        from pathlib import Path
+        from threadpoolctl import threadpool_limits
+        from spacy.util import load_config
+        from spacy.training.initialize import init_nlp
+        from spacy.training.loop import train
+
+        # Load the configuration with the data paths and the other options applied as overrides
         cfg_path = config_path or CONFIGS_DIR
-        config_file_path = os.path.join(cfg_path, 'train.cfg')
+        config_overrides = {'paths.train': train_path, 'paths.dev': dev_path}
+        if batch_size:
+            config_overrides['training.batcher.size'] = batch_size
+        config_overrides.update(overrides or {})
+        config = load_config(os.path.join(cfg_path, 'train.cfg'), overrides=config_overrides)
 
-        # Read the configuration file
-        with open(config_file_path, 'r', encoding='utf-8') as file:
-            cfg_contents = file.read()
+        # Time every epoch from the updates and take its scores from the logger, keeping the configured callbacks
+        epochs = []
+        def report_epoch(epoch):
+            epochs.append(epoch)
+            score = f"{epoch['score']:.4f}" if epoch['score'] is not None else 'not evaluated'
+            logging.getLogger('Safaa').info("Epoch %d: %.1f s, score %s", epoch['epoch'], epoch['seconds'], score)
+            if epoch_callback:
+                epoch_callback(epoch)
+        callback_id = _register_epoch_callback(report_epoch)
+        config['training']['before_update'] = {
+            '@callbacks': 'Safaa.EpochTimer.v1',
+            'callback_id': callback_id,
+            'before_update': config['training'].get('before_update'),
+        }
+        config['training']['logger'] = {
+            '@loggers': 'Safaa.EpochLogger.v1',
+            'callback_id': callback_id,
+            'logger': config['training']['logger'],
+        }
 
-        # Update the training and development data paths in the configuration contents
-        updated_cfg_contents = re.sub(
-            r'train\s*=\s*".*"', f'train = "{train_path}"', 
-            re.sub(r'dev\s*=\s*".*"', f'dev = "{dev_path}"', cfg_contents)
-        )
+        # Determine the model directory paths; the run gets its own directory next to the installed model
+        from Safaa.registry import ModelRegistry
+        output_dir = output_dir or LOCAL_MODEL_DIR
+        name = 'declutter_model' if declutter_model else 'entity_recognizer'
+        new_model_path = os.path.join(output_dir, name)
+        os.makedirs(output_dir, exist_ok=True)
+        tmp_model_path = tempfile.mkdtemp(prefix='.train-', dir=output_dir)
 
-        # Write the updated configuration to a temporary file
-        tmp_cfg_path = os.path.join(cfg_path, 'tmp.cfg')
-        with open(tmp_cfg_path, 'w', encoding='utf-8') as file:
-            file.write(updated_cfg_contents)
+        try:
+            with threadpool_limits(limits=threads):
+                nlp = init_nlp(config, use_gpu=use_gpu)
+                train(nlp, Path(tmp_model_path), use_gpu=use_gpu)
 
-        # Determine the model directory paths
-        tmp_model_path = os.path.join(LOCAL_MODEL_DIR, 'tmp')
-        new_model_dir = 'declutter_model' if declutter_model else 'entity_recognizer'
-        new_model_path = os.path.join(LOCAL_MODEL_DIR, new_model_dir)
+            if ModelRegistry.is_registry(output_dir):
+                # Publish a new version holding the new model and the other models of the active version
+                publish_path = os.path.join(tmp_model_path, 'publish')
+                os.makedirs(publish_path)
+                os.rename(os.path.join(tmp_model_path, 'model-best'), os.path.join(publish_path, name))
+                ModelRegistry(output_dir).publish(publish_path)
+            else:
+                # Swap the best model into place
+                self._install_model(os.path.join(tmp_model_path, 'model-best'), new_model_path)
+        finally:
+            _EPOCH_REPORTERS.pop(callback_id, None)
+            shutil.rmtree(tmp_model_path, ignore_errors=True)
 
-        # Create the new model directory if it doesn't exist
-        os.makedirs(new_model_path, exist_ok=True)
+        # Load the new model on next use if this agent uses the replaced one
+        other_models = [other for other in MODEL_NAMES if other != name]
+        if self.registry and os.path.abspath(self.registry.root) == os.path.abspath(output_dir):
+            self._swap_state(self.registry.current_path(), keep=other_models)
+        elif os.path.abspath(self._state.paths[name]) == os.path.abspath(new_model_path):
+            self._swap_state(self.model_dir, keep=other_models)
 
-        # Construct the training command and execute it
-        train_command = f"python -m spacy train '{tmp_cfg_path}' --output '{tmp_model_path}'"
-        os.system(train_command)
+        return epochs
 
-        # Move the trained model files to the new model directory
-        self._move_files(os.path.join(tmp_model_path, 'model-best'), new_model_path)
+    def _swap_state(self, model_dir, keep=()):
+        """
+        Internal helper that switches to the models of a directory, loading them on first use.
 
-        # Clean up the temporary files and directories
-        os.remove(tmp_cfg_path)
-        shutil.rmtree(tmp_model_path)
-    
-    def _move_files(self, src_dir, dst_dir):
+        Parameters:
+        model_dir (str): The model directory to switch to.
+        keep (iterable): Names of the loaded models that are unchanged and do not need to be loaded again. Defaults to ().
+        """
+
+        old_state = self._active_state()
+        models = {name: model for name, model in old_state.models.items() if name in keep}
+        state = _ModelState(self._model_paths(model_dir), models)
+        # Kept models may still differ from their files
+        state.generation, state.generation_id = old_state.generation, old_state.generation_id
+        self.model_dir = model_dir
+        self._state = state
+
+    def _install_model(self, src_dir, dst_dir):
         """
-        Internal helper method to move files from one directory to another.
+        Internal helper that replaces a model directory with a newly trained one.
+
+        The model is installed with install_directory, so dst_dir is a symlink swapped
+        atomically and always resolves to one complete model.
 
         Parameters:
-        src_dir (str): The source directory from where the files are to be moved.
-        dst_dir (str): The destination directory where the files are to be moved.
+        src_dir (str): The directory of the new model, on the same file system as dst_dir.
+        dst_dir (str): The path of the installed model.
         """
 
-        # List all items in the source directory
-        for item in os.listdir(src_dir):
-            # Construct full paths for source and destination
-            src_item_path = os.path.join(src_dir, item)
-            dst_item_path = os.path.join(dst_dir, item)
-            # Move each item from the source directory to the destination directory
-            shutil.move(src_item_path, dst_item_path)
+        from Safaa.artifacts import install_directory
+        install_directory(src_dir, dst_dir)
 
-    def save(self, path=None):
+    @_pin_models
+    def save(self, path=None, model_format='pickle'):
         """
         Saves the trained models and vectorizer to the specified path.
         
         Make sure the directory you have permissions to the directory that you are
-        saving to. 
+        saving to. The fast variant is saved into the 'fast' subdirectory of the path.
         
         Parameters:
         path (str): The path to save the models and vectorizer to. Defaults to None.
+        model_format (str): 'pickle' for joblib pickles or 'mmap' for pickle-free memory-mapped artifacts. Defaults to 'pickle'.
         """
 
         # Determine the directory path to save the models and vectorizer
-        save_path = path or '/home/fossy/Safaa'
+        save_path = path or LOCAL_MODEL_DIR
         
         # Create the directory if it does not exist
         os.makedirs(save_path, exist_ok=True)
 
         # Check directory permissions
-        if not os.access(path, os.W_OK):
+        if not os.access(save_path, os.W_OK):
             print(f"Write permissions are not granted for the directory: {save_path}")
             return
-        
+
+        from Safaa.registry import ModelRegistry
+        if ModelRegistry.is_registry(save_path):
+            # Publish a new version holding these models and the spaCy pipelines of the active version
+            import tempfile
+            registry = ModelRegistry(save_path)
+            staging_path = tempfile.mkdtemp(prefix='.save-', dir=save_path)
+            classifier_names = [
+                f'false_positive_detection_{kind}.{extension}'
+                for kind in ('model', 'vectorizer') for extension in ('pkl', 'mmap')
+            ]
+            try:
+                if self.model_variant == 'fast':
+                    # The fast models are a single entry of a version, so carry over its spaCy pipelines
+                    fast_path = os.path.join(staging_path, FAST_MODEL_DIR)
+                    shutil.copytree(
+                        os.path.join(registry.current_path(), FAST_MODEL_DIR), fast_path, copy_function=os.link,
+                        ignore=lambda directory, names: [name for name in names if name in classifier_names]
+                    )
+                    self._write_classifier(fast_path, model_format)
+                    registry.publish(staging_path)
+                else:
+                    self._write_classifier(staging_path, model_format)
+                    registry.publish(staging_path, exclude=classifier_names)
+            finally:
+                shutil.rmtree(staging_path, ignore_errors=True)
+
+            # The saved models are the ones in memory, so they stay loaded
+            if self.registry and os.path.abspath(self.registry.root) == os.path.abspath(save_path):
+                self._swap_state(self.registry.current_path(), keep=MODEL_NAMES)
+            return
+
+        if self.model_variant == 'fast':
+            save_path = os.path.join(save_path, FAST_MODEL_DIR)
+            os.makedirs(save_path, exist_ok=True)
+        self._write_classifier(save_path, model_format)
+        # The model files changed on disk
+        self._active_state().fingerprint = None
+
+    def _write_classifier(self, save_path, model_format):
+        """
+        Internal helper that writes the false positive detector model and vectorizer to a directory.
+
+        Parameters:
+        save_path (str): The directory to write to.
+        model_format (str): 'pickle' for joblib pickles or 'mmap' for pickle-free memory-mapped artifacts.
+        """
+
+        if model_format == 'mmap':
+            from Safaa.artifacts import save_artifact
+            save_artifact(self.false_positive_detector, os.path.join(save_path, 'false_positive_detection_model.mmap'))
+            save_artifact(self.vectorizer, os.path.join(save_path, 'false_positive_detection_vectorizer.mmap'))
+            return
+
         # Construct the full paths for the model and vectorizer files
         false_positive_detector_path = os.path.join(save_path, 'false_positive_detection_model.pkl')
         vectorizer_path = os.path.join(save_path, 'false_positive_detection_vectorizer.pkl')
 
         # Save the false positive detector model and vectorizer to the specified paths
+        from joblib import dump
         dump(self.false_positive_detector, false_positive_detector_path)
-        dump(self.vectorizer, vectorizer_path)
\ No newline at end of file
+        dump(self.vectorizer, vectorizer_path)
+
+def make_hashing_vectorizer(n_features=2 ** 20):
+    """
+    Builds the stateless hashing vectorizer used when feature_extraction is 'hashing'.
+
+    It uses the same binary unigrams and bigrams as the TF-IDF vectorizer, without
+    the idf weights, so it can transform any chunk of data without being fitted.
+
+    Parameters:
+    n_features (int): Number of hashed features. Defaults to 2 ** 20.
+
+    Returns:
+    HashingVectorizer: The vectorizer.
+    """
+
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(n_features=n_features, ngram_range=(1, 2), binary=True, alternate_sign=False, norm='l2')
+
+class _EpochReporter:
+    """
+    Times the epochs of a spaCy training run and reports each one with its last evaluation.
+
+    spaCy calls before_update with the step and epoch of every update, so an epoch ends
+    exactly when the first update of the next one starts, or when training ends. The
+    logger only records the scores and losses of the evaluations in between.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.epoch = None
+        self.step = None
+        self.start = None
+        self.evaluation = None
+
+    def update_started(self, step, epoch):
+        """
+        Records an update, reporting the previous epoch if this one starts a new epoch.
+        """
+
+        now = time.perf_counter()
+        if epoch != self.epoch:
+            self.finish(now)
+            self.epoch, self.start, self.evaluation = epoch, now, None
+        self.step = step
+
+    def evaluated(self, info):
+        """
+        Records the scores and losses of an evaluation of the current epoch.
+        """
+
+        self.evaluation = (info['score'], dict(info['other_scores']), dict(info['losses']))
+
+    def finish(self, now=None):
+        """
+        Reports the current epoch, if any, as ending now.
+        """
+
+        if self.epoch is None:
+            return
+        score, scores, losses = self.evaluation or (None, {}, {})
+        self.callback({
+            'epoch': self.epoch,
+            'seconds': (now or time.perf_counter()) - self.start,
+            'step': self.step,
+            'score': score,
+            'scores': scores,
+            'losses': losses,
+        })
+        self.epoch = None
+
+def _register_epoch_callback(callback):
+    """
+    Registers the per-epoch callback of a training run and the spaCy callbacks that drive it.
+
+    The callback cannot be passed through the training config, so the config only
+    holds the id it is registered under.
+
+    Parameters:
+    callback (callable): Called with a dict describing every epoch.
+
+    Returns:
+    str: The id to pass to the Safaa.EpochTimer.v1 callback and the Safaa.EpochLogger.v1 logger.
+    """
+
+    from spacy.util import registry
+
+    if 'Safaa.EpochTimer.v1' not in registry.callbacks:
+        registry.callbacks.register('Safaa.EpochTimer.v1', func=_epoch_timer)
+    if 'Safaa.EpochLogger.v1' not in registry.loggers:
+        registry.loggers.register('Safaa.EpochLogger.v1', func=_epoch_logger)
+
+    import uuid
+
+    callback_id = uuid.uuid4().hex
+    _EPOCH_REPORTERS[callback_id] = _EpochReporter(callback)
+    return callback_id
+
+def _epoch_timer(callback_id, before_update=None):
+    """
+    spaCy before_update callback that marks the epoch boundaries for a registered reporter.
+
+    Parameters:
+    callback_id (str): The id the reporter was registered under.
+    before_update (callable): The before_update callback of the training config, which keeps running. Defaults to None.
+
+    Returns:
+    callable: The callback called by spaCy before every update.
+    """
+
+    reporter = _EPOCH_REPORTERS[callback_id]
+
+    def mark_update(nlp, args):
+        if before_update is not None:
+            before_update(nlp, args)
+        reporter.update_started(args['step'], args['epoch'])
+
+    return mark_update
+
+def _epoch_logger(callback_id, logger):
+    """
+    spaCy training logger that passes every evaluation to a registered reporter.
+
+    spaCy only logs at evaluations, so the logger supplies the scores and losses of the
+    epochs, while their times come from Safaa.EpochTimer.v1.
+
+    Parameters:
+    callback_id (str): The id the reporter was registered under.
+    logger (callable): The logger of the training config, which keeps logging as before.
+
+    Returns:
+    callable: The logger setup function expected by spaCy.
+    """
+
+    import sys
+
+    def setup_logger(nlp, stdout=sys.stdout, stderr=sys.stderr):
+        log_step, finalize = logger(nlp, stdout, stderr)
+        reporter = _EPOCH_REPORTERS[callback_id]
+
+        def log_evaluation(info):
+            log_step(info)
+            if info is not None:
+                reporter.evaluated(info)
+
+        def finalize_epochs():
+            reporter.finish()
+            finalize()
+
+        return log_evaluation, finalize_epochs
+
+    return setup_logger
+
+def log_stage_timings(logger=None, level=logging.DEBUG):
+    """
+    Builds a stage callback for SafaaAgent that logs the wall time of every pipeline stage.
+
+    Parameters:
+    logger (logging.Logger): The logger to write to. Defaults to the 'Safaa' logger.
+    level (int): The logging level of the messages. Defaults to logging.DEBUG.
+
+    Returns:
+    callable: A callback to pass as SafaaAgent's stage_callback.
+    """
+
+    logger = logger or logging.getLogger('Safaa')
+
+    def callback(stage, seconds, size):
+        logger.log(level, "%s: %d strings in %.3f s", stage, size, seconds)
+
+    return callback
@@ -0,0 +1,42 @@
+"""
+Command line entry point of the Safaa package: python -m Safaa <command>.
+"""
+
+import sys
+import importlib
+from argparse import ArgumentParser
+
+# The subcommands, the Safaa module implementing each of them and their help text
+COMMANDS = {
+    "serve": ("server", "Run a long-lived inference server that keeps the models loaded"),
+    "bench": ("bench", "Benchmark the stages of the pipeline"),
+    "score": ("score", "Score a whole CSV or JSONL file of copyright findings, resuming after interruptions"),
+    "export": ("export", "Export the lighter fast variant of the models"),
+}
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = ArgumentParser(prog="python -m Safaa", description="Safaa copyright false positive detection")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # Only the module of the requested subcommand is imported
+    module = None
+    for command, (module_name, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(command, help=help_text)
+        if argv and argv[0] == command:
+            module = importlib.import_module(f"Safaa.{module_name}")
+            module.add_arguments(subparser)
+
+    args = parser.parse_args(argv)
+
+    if module is None:
+        parser.print_help()
+        return
+    module.main(args)
+
+
+if __name__ == "__main__":
+    main()
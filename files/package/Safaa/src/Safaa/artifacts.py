@@ -0,0 +1,422 @@
+"""
+Pickle-free, memory-mapped artifact format for the false positive detector and its vectorizer.
+
+An artifact is a directory holding a manifest.json that describes the object and
+raw .npy files for every array. Arrays are loaded with mmap_mode='r', so every
+process that loads the same artifact shares the same physical pages. The
+vocabulary of a fitted vectorizer is stored as a sorted array of CRC-32 hashes
+pointing into a single UTF-8 blob of terms instead of a Python dict.
+"""
+
+import os
+import json
+import mmap
+import zlib
+import shutil
+import importlib
+from collections.abc import Mapping
+
+import numpy as np
+import scipy.sparse as sp
+
+# Constants
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+# Only classes from these packages are rebuilt when loading an artifact
+ALLOWED_MODULES = ('sklearn.', 'Safaa.')
+
+
+class MappedVocabulary(Mapping):
+    """
+    Read-only term to feature index mapping backed by memory-mapped files.
+
+    The terms are kept in one UTF-8 blob, sorted by their CRC-32 hash. A lookup
+    binary searches the hash array and compares the candidate term bytes, so
+    the result is always identical to the dict it was built from.
+    """
+
+    def __init__(self, path):
+        """
+        Opens a vocabulary saved by MappedVocabulary.save.
+
+        Parameters:
+        path (str): The directory holding the vocabulary files.
+        """
+
+        self.hashes = np.load(os.path.join(path, 'vocabulary_hashes.npy'), mmap_mode='r')
+        self.indices = np.load(os.path.join(path, 'vocabulary_indices.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'vocabulary_offsets.npy'), mmap_mode='r')
+        with open(os.path.join(path, 'vocabulary_terms.bin'), 'rb') as file:
+            # mmap cannot map an empty file
+            self.terms = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b''
+
+    @staticmethod
+    def save(vocabulary, path):
+        """
+        Saves a term to feature index dict as vocabulary files.
+
+        Parameters:
+        vocabulary (dict): The vocabulary, e.g. the vocabulary_ of a fitted TfidfVectorizer.
+        path (str): The directory to write the vocabulary files to.
+        """
+
+        encoded = [(zlib.crc32(term.encode('utf-8')), term.encode('utf-8'), index) for term, index in vocabulary.items()]
+        encoded.sort()
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(term) for _, term, _ in encoded])
+
+        np.save(os.path.join(path, 'vocabulary_hashes.npy'), np.array([h for h, _, _ in encoded], dtype=np.uint32))
+        np.save(os.path.join(path, 'vocabulary_indices.npy'), np.array([i for _, _, i in encoded], dtype=np.int64))
+        np.save(os.path.join(path, 'vocabulary_offsets.npy'), offsets)
+        with open(os.path.join(path, 'vocabulary_terms.bin'), 'wb') as file:
+            file.write(b''.join(term for _, term, _ in encoded))
+
+    def lookup(self, terms):
+        """
+        Looks up many terms at once.
+
+        Parameters:
+        terms (list): The terms to look up.
+
+        Returns:
+        numpy.ndarray: The feature index of every term, or -1 for terms missing from the vocabulary.
+        """
+
+        encoded = [term.encode('utf-8') for term in terms]
+        hashes = np.fromiter((zlib.crc32(term) for term in encoded), dtype=np.uint32, count=len(encoded))
+        result = np.full(len(encoded), -1, dtype=np.int64)
+        if not len(self.hashes):
+            return result
+
+        # Binary search every hash at once, then confirm the candidates byte by byte
+        positions = np.searchsorted(self.hashes, hashes)
+        candidates = np.nonzero(self.hashes[np.minimum(positions, len(self.hashes) - 1)] == hashes)[0]
+        for position, term_hash, term, candidate in zip(
+                positions[candidates].tolist(), hashes[candidates].tolist(),
+                [encoded[candidate] for candidate in candidates.tolist()], candidates.tolist()):
+            # Walk the run of equal hashes in case of a collision
+            while position < len(self.hashes) and self.hashes[position] == term_hash:
+                if self.terms[self.offsets[position]:self.offsets[position + 1]] == term:
+                    result[candidate] = self.indices[position]
+                    break
+                position += 1
+        return result
+
+    def __getitem__(self, term):
+        index = int(self.lookup([term])[0])
+        if index < 0:
+            raise KeyError(term)
+        return index
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __iter__(self):
+        for position in range(len(self.hashes)):
+            yield self.terms[self.offsets[position]:self.offsets[position + 1]].decode('utf-8')
+
+
+class MappedTfidfVectorizer:
+    """
+    Drop-in replacement for a fitted TfidfVectorizer whose vocabulary and idf weights are memory-mapped.
+
+    The documents are analyzed with scikit-learn's own analyzer and the counts are
+    weighted with scikit-learn's own TfidfTransformer, so transform returns exactly
+    the same matrix as the vectorizer it was exported from.
+    """
+
+    def __init__(self, params, vocabulary, idf):
+        """
+        Initializes the MappedTfidfVectorizer.
+
+        Parameters:
+        params (dict): The parameters of the original TfidfVectorizer.
+        vocabulary (MappedVocabulary): The vocabulary of the original TfidfVectorizer.
+        idf (numpy.ndarray): The idf weights of the original TfidfVectorizer, or None if use_idf is off.
+        """
+
+        from sklearn.feature_extraction.text import TfidfVectorizer, TfidfTransformer
+
+        self.params = params
+        self.vocabulary_ = vocabulary
+        self.binary = params['binary']
+        self.dtype = np.dtype(params['dtype'])
+        self._analyze = TfidfVectorizer(**dict(params, dtype=self.dtype)).build_analyzer()
+        self._tfidf = TfidfTransformer(
+            norm=params['norm'], use_idf=params['use_idf'],
+            smooth_idf=params['smooth_idf'], sublinear_tf=params['sublinear_tf']
+        )
+        if idf is not None:
+            self._tfidf.idf_ = idf
+
+    def transform(self, raw_documents):
+        """
+        Transforms documents to a tf-idf weighted document-term matrix.
+
+        Parameters:
+        raw_documents (iterable): The documents to transform.
+
+        Returns:
+        scipy.sparse.csr_matrix: The document-term matrix.
+        """
+
+        # Analyze every document and look all of their terms up at once
+        terms = []
+        indptr = [0]
+        for document in raw_documents:
+            terms.extend(self._analyze(document))
+            indptr.append(len(terms))
+        indices = self.vocabulary_.lookup(terms)
+
+        # Drop the unknown terms and count the known ones per document
+        known = indices >= 0
+        indptr = np.concatenate(([0], np.cumsum(known)))[indptr]
+        counts = sp.csr_matrix(
+            (np.ones(int(known.sum()), dtype=self.dtype), indices[known], indptr),
+            shape=(len(indptr) - 1, len(self.vocabulary_))
+        )
+        counts.sum_duplicates()
+        if self.binary:
+            counts.data.fill(1)
+
+        return self._tfidf.transform(counts, copy=False)
+
+    def to_sklearn(self):
+        """
+        Returns an unfitted TfidfVectorizer with the parameters of this vectorizer, e.g. to train a new model.
+        """
+
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        return TfidfVectorizer(**dict(self.params, dtype=self.dtype.type))
+
+    def get_feature_names_out(self):
+        """
+        Returns the terms of the vocabulary ordered by feature index.
+        """
+
+        names = np.empty(len(self.vocabulary_), dtype=object)
+        for term, index in zip(self.vocabulary_, self.vocabulary_.indices.tolist()):
+            names[index] = term
+        return names
+
+
+def _encode(value, path, arrays):
+    """
+    Internal helper that turns a value into a JSON-serializable node, saving arrays as .npy files.
+
+    Parameters:
+    value (object): The value to encode.
+    path (str): The artifact directory.
+    arrays (list): Names of the arrays saved so far, used to name new ones.
+
+    Returns:
+    object: The JSON-serializable node.
+
+    Raises:
+    TypeError: If the value cannot be stored without pickle.
+    """
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return {'__list_array__': [_encode(item, path, arrays) for item in value.tolist()]}
+        name = f'array_{len(arrays)}.npy'
+        arrays.append(name)
+        np.save(os.path.join(path, name), np.ascontiguousarray(value))
+        return {'__ndarray__': name}
+    if isinstance(value, np.generic):
+        return {'__scalar__': value.item(), 'dtype': value.dtype.str}
+    if sp.issparse(value):
+        value = value.tocsr()
+        return {
+            '__sparse__': type(value).__name__,
+            'data': _encode(value.data, path, arrays),
+            'indices': _encode(value.indices, path, arrays),
+            'indptr': _encode(value.indptr, path, arrays),
+            'shape': list(value.shape),
+        }
+    if isinstance(value, type) and issubclass(value, np.generic):
+        return {'__dtype__': np.dtype(value).str}
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(item, path, arrays) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {'__set__': [_encode(item, path, arrays) for item in sorted(value)]}
+    if isinstance(value, list):
+        return [_encode(item, path, arrays) for item in value]
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {'__dict__': {key: _encode(item, path, arrays) for key, item in value.items()}}
+    if type(value).__module__.startswith(ALLOWED_MODULES) and hasattr(value, '__getstate__'):
+        state = value.__getstate__()
+        if isinstance(state, dict):
+            return {
+                '__object__': f'{type(value).__module__}.{type(value).__qualname__}',
+                'state': _encode(state, path, arrays),
+            }
+    raise TypeError(f"Cannot store a {type(value).__name__} in a memory-mapped artifact")
+
+
+def _decode(node, path):
+    """
+    Internal helper that rebuilds a value from a node written by _encode.
+
+    Parameters:
+    node (object): The JSON node.
+    path (str): The artifact directory.
+
+    Returns:
+    object: The rebuilt value.
+    """
+
+    if isinstance(node, list):
+        return [_decode(item, path) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if '__ndarray__' in node:
+        return np.load(os.path.join(path, node['__ndarray__']), mmap_mode='r')
+    if '__list_array__' in node:
+        values = [_decode(item, path) for item in node['__list_array__']]
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+    if '__scalar__' in node:
+        return np.dtype(node['dtype']).type(node['__scalar__'])
+    if '__sparse__' in node:
+        matrix_class = getattr(sp, node['__sparse__'])
+        return matrix_class(
+            (_decode(node['data'], path), _decode(node['indices'], path), _decode(node['indptr'], path)),
+            shape=tuple(node['shape'])
+        )
+    if '__dtype__' in node:
+        return np.dtype(node['__dtype__']).type
+    if '__tuple__' in node:
+        return tuple(_decode(item, path) for item in node['__tuple__'])
+    if '__set__' in node:
+        return set(_decode(item, path) for item in node['__set__'])
+    if '__dict__' in node:
+        return {key: _decode(item, path) for key, item in node['__dict__'].items()}
+    if '__object__' in node:
+        module_name, _, class_name = node['__object__'].rpartition('.')
+        if not module_name.startswith(ALLOWED_MODULES):
+            raise ValueError(f"Refusing to load {node['__object__']} from an artifact")
+        obj = object.__new__(getattr(importlib.import_module(module_name), class_name))
+        obj.__setstate__(_decode(node['state'], path))
+        return obj
+    raise ValueError(f"Unknown artifact node: {sorted(node)}")
+
+
+def install_directory(src_dir, dst_dir):
+    """
+    Installs a directory at a path that readers may be loading from at the same time.
+
+    Every install is moved into a hidden directory next to dst_dir, and dst_dir is a
+    symlink to it that is swapped with os.replace, like ModelRegistry.activate does, so
+    dst_dir always resolves to one complete directory. The replaced directory is kept
+    until the next install, so readers that resolved the symlink just before the swap
+    can finish loading it. A dst_dir that is still a plain directory is moved aside
+    first, the only time dst_dir is briefly missing.
+
+    Parameters:
+    src_dir (str): The complete new directory, on the same file system as dst_dir.
+    dst_dir (str): The path to install it at.
+    """
+
+    import uuid
+    parent, name = os.path.split(os.path.abspath(dst_dir))
+    target = f'.{name}-{uuid.uuid4().hex}'
+    os.rename(src_dir, os.path.join(parent, target))
+
+    # Keep the replaced directory, moving a plain directory into a hidden one
+    replaced = None
+    if os.path.islink(dst_dir):
+        replaced = os.path.basename(os.readlink(dst_dir))
+    elif os.path.exists(dst_dir):
+        replaced = f'.{name}-{uuid.uuid4().hex}'
+        os.rename(dst_dir, os.path.join(parent, replaced))
+
+    # Point a new symlink at the new directory and rename it over the installed one
+    tmp_link = os.path.join(parent, f'.{name}.tmp-{os.getpid()}')
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(target, tmp_link)
+    os.replace(tmp_link, dst_dir)
+
+    # Delete the directories installed before the replaced one
+    for entry in os.listdir(parent):
+        if entry.startswith(f'.{name}-') and entry not in (target, replaced):
+            shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+def save_artifact(obj, path):
+    """
+    Saves a fitted classifier or vectorizer as a memory-mappable artifact directory.
+
+    The artifact is written to a hidden directory next to the destination and installed
+    with install_directory once complete, so readers never find it missing or partial.
+
+    Parameters:
+    obj (object): The fitted scikit-learn estimator or vectorizer.
+    path (str): The artifact directory to create or replace.
+    """
+
+    parent, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(parent, f'.{name}.staging-{os.getpid()}')
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    if isinstance(obj, (TfidfVectorizer, MappedTfidfVectorizer)):
+        # Store the vocabulary as a hash index and the idf weights as a raw array
+        if isinstance(obj, MappedTfidfVectorizer):
+            params = obj.params
+            idf = getattr(obj._tfidf, 'idf_', None)
+        else:
+            params = {key: value for key, value in obj.get_params().items() if key != 'vocabulary'}
+            params['dtype'] = np.dtype(params['dtype']).str
+            idf = obj.idf_ if obj.use_idf else None
+        MappedVocabulary.save(dict(obj.vocabulary_.items()), tmp_path)
+        if idf is not None:
+            np.save(os.path.join(tmp_path, 'idf.npy'), np.asarray(idf))
+        manifest = {'type': 'tfidf_vectorizer', 'params': _encode(params, tmp_path, [])}
+    else:
+        manifest = {'type': 'object', 'root': _encode(obj, tmp_path, [])}
+
+    manifest['format_version'] = FORMAT_VERSION
+    with open(os.path.join(tmp_path, MANIFEST_NAME), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file)
+
+    # Swap the complete artifact into place
+    install_directory(tmp_path, path)
+
+
+def load_artifact(path):
+    """
+    Loads an artifact saved by save_artifact, memory-mapping its arrays.
+
+    Parameters:
+    path (str): The artifact directory.
+
+    Returns:
+    object: The classifier or vectorizer.
+    """
+
+    # Resolve an installed artifact's symlink once, so all its files come from the same install
+    path = os.path.realpath(path)
+    with open(os.path.join(path, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version: {manifest.get('format_version')}")
+
+    if manifest['type'] == 'tfidf_vectorizer':
+        idf_path = os.path.join(path, 'idf.npy')
+        idf = np.load(idf_path, mmap_mode='r') if os.path.exists(idf_path) else None
+        return MappedTfidfVectorizer(_decode(manifest['params'], path), MappedVocabulary(path), idf)
+    return _decode(manifest['root'], path)
+
+
+def is_artifact(path):
+    """
+    Checks whether a path is an artifact directory.
+    """
+
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
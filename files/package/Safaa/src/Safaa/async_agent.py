@@ -0,0 +1,296 @@
+"""
+AsyncSafaaAgent: An asyncio front-end for SafaaAgent with micro-batching.
+"""
+
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from Safaa.Safaa import SafaaAgent
+from Safaa.parallel import ParallelSafaaAgent
+
+# The agent of the current executor process and the keyword arguments it was built from
+_process_agent = None
+_process_agent_kwargs = None
+
+
+def _run_batch(agent, method, items, options):
+    """
+    Runs a micro-batch on an agent.
+
+    Parameters:
+    agent (SafaaAgent): The agent, or a ParallelSafaaAgent, that runs the batch.
+    method (str): One of 'predict', 'declutter' or 'analyze'.
+    items (list): The strings of the batch, or (string, prediction) pairs for 'declutter'.
+    options (tuple): Sorted (name, value) pairs of keyword arguments, e.g. the threshold.
+
+    Returns:
+    list: The result of every item.
+    """
+
+    kwargs = dict(options)
+    # Split the batch evenly over the workers instead of sending it to a single one
+    if isinstance(agent, ParallelSafaaAgent):
+        kwargs['chunk_size'] = max(1, -(-len(items) // agent.workers))
+    if method == 'declutter':
+        return agent.declutter([text for text, _ in items], [label for _, label in items], **kwargs)
+    return getattr(agent, method)(items, **kwargs)
+
+
+def _run_batch_in_process(agent_kwargs, method, items, options):
+    """
+    Runs a micro-batch in a process executor, on an agent built once per process.
+
+    Parameters:
+    agent_kwargs (dict): Keyword arguments passed to SafaaAgent.
+    method (str): One of 'predict', 'declutter' or 'analyze'.
+    items (list): The strings of the batch, or (string, prediction) pairs for 'declutter'.
+    options (tuple): Sorted (name, value) pairs of keyword arguments, e.g. the threshold.
+
+    Returns:
+    list: The result of every item.
+    """
+
+    global _process_agent, _process_agent_kwargs
+    if _process_agent is None or _process_agent_kwargs != agent_kwargs:
+        _process_agent = SafaaAgent(**agent_kwargs)
+        _process_agent_kwargs = agent_kwargs
+    return _run_batch(_process_agent, method, items, options)
+
+
+class AsyncSafaaAgent:
+    """
+    Lets many coroutines call predict, declutter and analyze without blocking the event loop.
+
+    Every string is queued individually and a background task flushes the queue as
+    micro-batches, by size or by timeout, onto an executor running the wrapped agent.
+    Each caller only gets back the results of its own strings. The queue is bounded,
+    so callers wait when it is full, and strings of cancelled calls are skipped.
+
+    The batches run on a single thread by default. To use several cores, either wrap a
+    ParallelSafaaAgent, which splits every batch over its worker processes, or pass a
+    ProcessPoolExecutor together with the SafaaAgent keyword arguments, so every process
+    builds its own agent and up to one batch per process runs at a time.
+    """
+
+    def __init__(self, agent=None, max_batch_size=256, max_latency=0.005, max_queue_size=10000,
+                 executor=None, concurrency=None, **agent_kwargs):
+        """
+        Initializes the AsyncSafaaAgent. The background task is started on first use.
+
+        Parameters:
+        agent (SafaaAgent): The agent, or a ParallelSafaaAgent, that runs the batches. Defaults to a new SafaaAgent
+            built from agent_kwargs, or to one SafaaAgent per process of a ProcessPoolExecutor.
+        max_batch_size (int): Maximum number of strings per micro-batch. Defaults to 256.
+        max_latency (float): Maximum seconds a string waits for a micro-batch to fill. Defaults to 0.005.
+        max_queue_size (int): Maximum number of queued strings before callers wait. Defaults to 10000.
+        executor (concurrent.futures.Executor): Executor the batches run on. Defaults to a single thread.
+        concurrency (int): Maximum number of batches running at a time. Defaults to the number of processes
+            of a ProcessPoolExecutor, and to 1 otherwise.
+        agent_kwargs: Keyword arguments passed to SafaaAgent when no agent is given.
+
+        Raises:
+        ValueError: If an agent is given together with a ProcessPoolExecutor.
+        """
+
+        # An agent cannot be sent to other processes, so they build their own from the keyword arguments
+        self._in_process = isinstance(executor, ProcessPoolExecutor)
+        if self._in_process and agent is not None:
+            raise ValueError("A ProcessPoolExecutor builds its own agents: pass the SafaaAgent keyword arguments instead of an agent")
+        self.agent_kwargs = dict(agent_kwargs, n_process=1) if self._in_process else agent_kwargs
+        self.agent = None if self._in_process else agent or SafaaAgent(**agent_kwargs)
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_queue_size = max_queue_size
+
+        # spaCy pipelines are not thread-safe, so batches run one at a time by default
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='safaa')
+        self.concurrency = concurrency or (executor._max_workers if self._in_process else 1)
+
+        self._queue = None
+        self._task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _ensure_started(self):
+        """
+        Internal helper that creates the queue and the flush task on the running event loop.
+        """
+
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def _submit(self, method, items, options=()):
+        """
+        Internal helper that queues every item of a call and waits for their results.
+
+        Parameters:
+        method (str): One of 'predict', 'declutter' or 'analyze'.
+        items (list): The strings of the call, or (string, prediction) pairs for 'declutter'.
+        options (tuple): Sorted (name, value) pairs of keyword arguments, e.g. the threshold. Defaults to ().
+
+        Returns:
+        list: The results of the items, in order.
+        """
+
+        self._ensure_started()
+        loop = asyncio.get_event_loop()
+        futures = []
+        try:
+            for item in items:
+                future = loop.create_future()
+                # Waits while the queue is full, which applies backpressure to the callers
+                await self._queue.put((method, options, item, future))
+                futures.append(future)
+            return list(await asyncio.gather(*futures))
+        except BaseException:
+            # The call was cancelled or failed, its queued items no longer need results
+            for future in futures:
+                future.cancel()
+            raise
+
+    async def _flush_loop(self):
+        """
+        Internal background task that collects queued items into micro-batches and runs them.
+        """
+
+        loop = asyncio.get_event_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        running, batch = set(), []
+        try:
+            while True:
+                # Wait for a batch to finish before collecting one that cannot run yet
+                await slots.acquire()
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_latency
+
+                # Keep collecting items until the batch is full or the latency bound is reached
+                while len(batch) < self.max_batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    except asyncio.QueueEmpty:
+                        pass
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Skip the items of cancelled calls and group the rest by method and options
+                groups = {}
+                for method, options, item, future in batch:
+                    if not future.done():
+                        groups.setdefault((method, options), []).append((item, future))
+
+                # Run the batch in the background, so the next one is collected while a slot is free
+                task = asyncio.ensure_future(self._run_groups(loop, groups))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                task.add_done_callback(lambda _: slots.release())
+                batch = []
+        except asyncio.CancelledError:
+            # The agent is closing, nobody will resolve the items of the running batches anymore
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            for _, _, _, future in batch:
+                future.cancel()
+            raise
+
+    async def _run_groups(self, loop, groups):
+        """
+        Internal helper that runs every group of a micro-batch on the executor and resolves its futures.
+        """
+
+        try:
+            for (method, options), requests in groups.items():
+                items = [item for item, _ in requests]
+                if self._in_process:
+                    call = partial(_run_batch_in_process, self.agent_kwargs, method, items, options)
+                else:
+                    call = partial(_run_batch, self.agent, method, items, options)
+                try:
+                    results = await loop.run_in_executor(self.executor, call)
+                except Exception as error:
+                    for _, future in requests:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                for (_, future), result in zip(requests, results):
+                    if not future.done():
+                        future.set_result(result)
+        except asyncio.CancelledError:
+            # The agent is closing, nobody will resolve the items of this batch anymore
+            for requests in groups.values():
+                for _, future in requests:
+                    future.cancel()
+            raise
+
+    async def predict(self, data, threshold=0.5):
+        """
+        Predicts false positives in the given data.
+
+        Parameters:
+        data (iterable): The data to predict.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+
+        Returns:
+        list: The predictions.
+        """
+
+        return await self._submit('predict', [str(item) for item in data], (('threshold', threshold),))
+
+    async def declutter(self, data, predictions):
+        """
+        Cleans up a copyright notice by removing extra text based on the predictions.
+
+        Parameters:
+        data (iterable): The data to declutter.
+        predictions (list): The predictions indicating false positives.
+
+        Returns:
+        list: The decluttered data.
+        """
+
+        return await self._submit('declutter', list(zip([str(item) for item in data], predictions)))
+
+    async def analyze(self, data, threshold=0.5):
+        """
+        Predicts false positives and declutters the true positives in a single call.
+
+        Parameters:
+        data (iterable): The data to analyze.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+
+        Returns:
+        list: A (prediction, false positive probability, decluttered text) tuple for each string.
+        """
+
+        return await self._submit('analyze', [str(item) for item in data], (('threshold', threshold),))
+
+    async def aclose(self):
+        """
+        Stops the background task and shuts down the executor if it was created by the agent.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+            # Cancel the calls still waiting in the queue
+            while not self._queue.empty():
+                self._queue.get_nowait()[3].cancel()
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,300 @@
+"""
+Benchmark suite for the stages of the SafaaAgent pipeline.
+
+Run it with `python -m Safaa bench` or `python -m Safaa.bench`.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import statistics
+import resource
+import tracemalloc
+from argparse import ArgumentParser
+from Safaa.Safaa import SafaaAgent
+
+# The stages reported by SafaaAgent's stage callback, in pipeline order
+STAGES = ['rules', 'entity_masking', 'normalization', 'vectorization', 'classification', 'declutter']
+
+
+def generate_corpus(size, seed=0):
+    """
+    Generates a synthetic corpus that looks like the output of FOSSology's copyright agent.
+
+    Parameters:
+    size (int): The number of strings to generate.
+    seed (int): The random seed. Defaults to 0.
+
+    Returns:
+    list: The generated strings.
+    """
+
+    rng = random.Random(seed)
+    holders = ['Free Software Foundation, Inc.', 'The Apache Software Foundation', 'Google LLC',
+               'Jane Doe', 'Ian F. Darwin', 'Zoë Müller', 'Siemens AG', 'The Authors']
+    templates = [
+        'Copyright (c) {year} {holder}',
+        'Copyright (C) {year}-{year2} {holder}. All rights reserved.',
+        '© {year} {holder} <{email}>',
+        'copyright {holder} {year}, {year2}',
+        'src/lib/{word}/{word}.c src/{word}/agent/{word}.php',
+        '{holder} ({email}) portions copyright {year} by {holder}',
+        'Permission is hereby granted, free of charge, to any person obtaining a copy {year}',
+        'copyright_list {word} {word}_{number} {word}-{number}',
+    ]
+    words = ['copyright', 'agent', 'tests', 'lib', 'reppath', 'spdx', 'delagent', 'fossjobs']
+    corpus = []
+    for _ in range(size):
+        holder = rng.choice(holders)
+        corpus.append(rng.choice(templates).format(
+            year=rng.randint(1980, 2023),
+            year2=rng.randint(1980, 2023),
+            holder=holder,
+            email=holder.split()[0].lower().strip(',.') + '@example.org',
+            word=rng.choice(words),
+            number=rng.randint(0, 100000),
+        ))
+    return corpus
+
+
+def load_corpus(path, column=None, limit=None):
+    """
+    Loads a corpus from a CSV, JSONL or plain text file.
+
+    Parameters:
+    path (str): Path to the corpus. CSV files use the given or first column, JSONL
+        files use the 'text' key and any other file is read one string per line.
+    column (str): The CSV column holding the strings. Defaults to None.
+    limit (int): Maximum number of strings to load. Defaults to None.
+
+    Returns:
+    list: The loaded strings.
+    """
+
+    if path.endswith('.csv'):
+        import pandas as pd
+        data = pd.read_csv(path, nrows=limit)
+        return data[column or data.columns[0]].astype(str).to_list()
+
+    corpus = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if limit is not None and len(corpus) >= limit:
+                break
+            if path.endswith('.jsonl'):
+                corpus.append(str(json.loads(line)[column or 'text']))
+            else:
+                corpus.append(line.rstrip('\n'))
+    return corpus
+
+
+class StageRecorder:
+    """
+    Stage callback for SafaaAgent that adds up the wall time and size of every stage.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.sizes = {}
+
+    def __call__(self, stage, seconds, size):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.sizes[stage] = self.sizes.get(stage, 0) + size
+
+
+def run_benchmark(agent, corpus, batch_sizes, threshold=0.5, repeats=3):
+    """
+    Runs predict and declutter over the corpus for every batch size and records every stage.
+
+    Every batch size is timed repeats times, taking turns with the other batch sizes, and
+    the fastest pass of every stage is kept, since it is the one least disturbed by other
+    work on the machine. Peak memory is measured in a pass of its own, because tracemalloc
+    slows some stages down far more than others and would skew their times.
+
+    Parameters:
+    agent (SafaaAgent): The agent to benchmark.
+    corpus (list): The strings to process.
+    batch_sizes (list): The spaCy batch sizes to benchmark.
+    threshold (float): The probability threshold for classification. Defaults to 0.5.
+    repeats (int): Number of timed passes per batch size. Defaults to 3.
+
+    Returns:
+    dict: The environment of the run and the measurements of every batch size.
+    """
+
+    # Load the models and warm up the pipelines so the first batch size is not penalized
+    agent._load_models()
+    agent.declutter(corpus[:10], agent.predict(corpus[:10], threshold))
+
+    def run_pass():
+        predictions = agent.predict(corpus, threshold)
+        agent.declutter(corpus, predictions)
+
+    # Time the passes without tracemalloc, taking turns so a slow spell does not hit a single batch size
+    total_seconds = {batch_size: [] for batch_size in batch_sizes}
+    stage_seconds = {batch_size: {} for batch_size in batch_sizes}
+    stage_sizes = {}
+    for _ in range(repeats):
+        for batch_size in batch_sizes:
+            recorder = StageRecorder()
+            agent.stage_callback = recorder
+            agent.batch_size = batch_size
+            start = time.perf_counter()
+            run_pass()
+            total_seconds[batch_size].append(time.perf_counter() - start)
+            for stage, seconds in recorder.seconds.items():
+                stage_seconds[batch_size].setdefault(stage, []).append(seconds)
+            stage_sizes[batch_size] = recorder.sizes
+    agent.stage_callback = None
+
+    results = []
+    for batch_size in batch_sizes:
+        agent.batch_size = batch_size
+
+        # Measure the peak memory in an untimed pass
+        tracemalloc.start()
+        try:
+            run_pass()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        results.append({
+            'batch_size': batch_size,
+            'repeats': repeats,
+            'total_seconds': min(total_seconds[batch_size]),
+            'median_total_seconds': statistics.median(total_seconds[batch_size]),
+            'throughput': len(corpus) / min(total_seconds[batch_size]),
+            'peak_memory_mib': peak_memory / 2 ** 20,
+            'stages': {
+                stage: {
+                    'seconds': min(seconds),
+                    'median_seconds': statistics.median(seconds),
+                    'size': stage_sizes[batch_size][stage],
+                    'throughput': stage_sizes[batch_size][stage] / min(seconds) if min(seconds) else None,
+                }
+                for stage, seconds in ((stage, stage_seconds[batch_size].get(stage)) for stage in STAGES) if seconds
+            },
+        })
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'max_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'corpus_size': len(corpus),
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.1, min_seconds=0.1):
+    """
+    Compares two benchmark runs and lists the stages whose throughput regressed.
+
+    Both runs are compared on the fastest of their repeated passes. Stages that took
+    less than min_seconds in the baseline are too short to time reliably and are skipped.
+
+    Parameters:
+    current (dict): The results of run_benchmark for the current run.
+    baseline (dict): The results of run_benchmark to compare against.
+    tolerance (float): Allowed relative drop in throughput. Defaults to 0.1.
+    min_seconds (float): Minimum baseline time of a stage to compare it. Defaults to 0.1.
+
+    Returns:
+    list: A message for every regression.
+    """
+
+    regressions = []
+    baseline_results = {result['batch_size']: result for result in baseline['results']}
+    for result in current['results']:
+        old = baseline_results.get(result['batch_size'])
+        if old is None:
+            continue
+        measurements = [('total', result['throughput'], old['throughput'])] + [
+            (stage, stats['throughput'], old['stages'][stage]['throughput'])
+            for stage, stats in result['stages'].items()
+            if stage in old['stages'] and old['stages'][stage]['seconds'] >= min_seconds
+        ]
+        for stage, new_throughput, old_throughput in measurements:
+            if new_throughput and old_throughput and new_throughput < old_throughput * (1 - tolerance):
+                regressions.append(
+                    f"batch_size={result['batch_size']} {stage}: "
+                    f"{new_throughput:,.0f}/s vs {old_throughput:,.0f}/s baseline"
+                )
+    return regressions
+
+
+def print_report(report):
+    """
+    Prints the results of run_benchmark as a table.
+    """
+
+    print(f"Corpus: {report['corpus_size']} strings")
+    header = f"{'batch':>6} {'total/s':>9} {'peak MiB':>9}" + ''.join(f" {stage + '/s':>17}" for stage in STAGES)
+    print(header)
+    for result in report['results']:
+        row = f"{result['batch_size']:>6} {result['throughput']:>9,.0f} {result['peak_memory_mib']:>9.1f}"
+        for stage in STAGES:
+            throughput = result['stages'].get(stage, {}).get('throughput')
+            row += f" {throughput:>17,.0f}" if throughput else f" {'-':>17}"
+        print(row)
+
+
+def add_arguments(parser):
+    """
+    Adds the command line arguments of the benchmark to a parser.
+    """
+
+    parser.add_argument("--corpus", default=None, help="CSV, JSONL or text file to benchmark on; a synthetic corpus is generated otherwise")
+    parser.add_argument("--column", default=None, help="CSV column or JSONL key holding the strings")
+    parser.add_argument("--size", type=int, default=10000, help="Number of strings to generate or load")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic corpus")
+    parser.add_argument("--batch-sizes", default="32,256,1000", help="Comma separated spaCy batch sizes")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed passes per batch size; the fastest one is kept")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to benchmark")
+    parser.add_argument("--output", default=None, help="Save the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative drop in throughput")
+    parser.add_argument("--min-seconds", type=float, default=0.1, help="Skip stages that took less than this in the baseline")
+
+
+def main(args):
+    """
+    Runs the benchmark from the parsed command line arguments.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line arguments.
+    """
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus, column=args.column, limit=args.size)
+    else:
+        corpus = generate_corpus(args.size, args.seed)
+
+    agent = SafaaAgent(model_dir=args.model_dir)
+    report = run_benchmark(agent, corpus, [int(size) for size in args.batch_sizes.split(',')], repeats=args.repeats)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            regressions = compare(report, json.load(file), args.tolerance, args.min_seconds)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(prog="python -m Safaa.bench", description="Benchmark the stages of the Safaa pipeline")
+    add_arguments(parser)
+    main(parser.parse_args())
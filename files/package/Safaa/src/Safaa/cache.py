@@ -0,0 +1,172 @@
+"""
+PredictionCache: A content-addressed cache for SafaaAgent results.
+"""
+
+import json
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Caches results per input string, keyed on a hash of the raw text and a model fingerprint.
+
+    Results are kept in a size-bounded in-memory LRU tier and, optionally, in an
+    sqlite file that can be shared between runs.
+    """
+
+    def __init__(self, max_size=100000, path=None):
+        """
+        Initializes the cache.
+
+        Parameters:
+        max_size (int): Maximum number of entries kept in memory. Defaults to 100000.
+        path (str): Path to an sqlite file used as the on-disk tier. Defaults to None.
+        """
+
+        self.max_size = max_size
+        self.path = path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Hit and miss counters for each tier
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # Open the on-disk tier if a path was given
+        self._connection = None
+        if path:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+            )
+            self._connection.commit()
+
+    @staticmethod
+    def make_key(text, fingerprint):
+        """
+        Builds the cache key of a string.
+
+        Parameters:
+        text (str): The raw input string.
+        fingerprint (str): Fingerprint of the models and options that produced the result.
+
+        Returns:
+        str: The hex digest used as the cache key.
+        """
+
+        digest = hashlib.sha256(fingerprint.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        """
+        Looks up several keys at once.
+
+        Parameters:
+        keys (list): The keys to look up.
+
+        Returns:
+        dict: The cached values of the keys that were found.
+        """
+
+        found = {}
+        with self._lock:
+            # Check the in-memory tier first
+            missing = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+            self.memory_hits += len(found)
+
+            # Fall back to the on-disk tier and promote the hits into memory
+            if missing and self._connection is not None:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows = self._connection.execute(
+                        f'SELECT key, value FROM results WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                    ).fetchall()
+                    for key, value in rows:
+                        found[key] = json.loads(value)
+                        self._remember(key, found[key])
+                        self.disk_hits += 1
+
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items):
+        """
+        Stores several results at once.
+
+        Parameters:
+        items (dict): Mapping from cache keys to JSON-serializable results.
+        """
+
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, value)
+            if self._connection is not None and items:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)',
+                    [(key, json.dumps(value)) for key, value in items.items()]
+                )
+                self._connection.commit()
+
+    def _remember(self, key, value):
+        """
+        Internal helper that stores a value in the in-memory LRU tier, evicting the oldest entries.
+        """
+
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the hit and miss statistics of the cache.
+
+        Returns:
+        dict: Hits per tier, misses, hit rate and number of entries in memory.
+        """
+
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_size': len(self._memory),
+            }
+
+    def clear(self):
+        """
+        Removes every entry from both tiers and resets the statistics.
+        """
+
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+            if self._connection is not None:
+                self._connection.execute('DELETE FROM results')
+                self._connection.commit()
+
+    def close(self):
+        """
+        Closes the on-disk tier.
+        """
+
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,140 @@
+"""
+SafaaClient: A thin client for SafaaServer that mirrors the SafaaAgent API.
+"""
+
+import json
+import socket
+import threading
+from Safaa.server import DEFAULT_SOCKET_PATH
+
+
+class SafaaClient:
+    """
+    Sends predict, declutter and analyze calls to a running SafaaServer.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, host=None, port=None, timeout=None):
+        """
+        Initializes the SafaaClient and connects to the server.
+
+        Parameters:
+        socket_path (str): Path of the server's Unix domain socket. Defaults to DEFAULT_SOCKET_PATH.
+        host (str): Host of the server, used instead of the socket path when a port is given. Defaults to None.
+        port (int): TCP port of the server. Defaults to None.
+        timeout (float): Socket timeout in seconds. Defaults to None.
+        """
+
+        if port:
+            self._socket = socket.create_connection((host or '127.0.0.1', port), timeout=timeout)
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(socket_path)
+        self._file = self._socket.makefile('rwb')
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _call(self, request):
+        """
+        Internal helper that sends a request and waits for its response.
+
+        Parameters:
+        request (dict): The request to send.
+
+        Returns:
+        object: The result of the request.
+
+        Raises:
+        RuntimeError: If the server answers with an error.
+        """
+
+        with self._lock:
+            self._file.write(json.dumps(request).encode('utf-8') + b'\n')
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise ConnectionError("The Safaa server closed the connection")
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def ping(self):
+        """
+        Checks that the server is answering.
+
+        Returns:
+        bool: True if the server answered.
+        """
+
+        return self._call({'method': 'ping'}) == 'pong'
+
+    def reload(self):
+        """
+        Makes the server load the latest models, e.g. a newly activated registry version.
+
+        Returns:
+        str: The model directory the server uses now.
+        """
+
+        return self._call({'method': 'reload'})
+
+    def predict(self, data, threshold=0.5):
+        """
+        Predicts false positives in the given data.
+
+        Parameters:
+        data (iterable): The data to predict.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+
+        Returns:
+        list: The predictions.
+        """
+
+        return self._call({'method': 'predict', 'data': [str(item) for item in data], 'threshold': threshold})
+
+    def declutter(self, data, predictions):
+        """
+        Cleans up a copyright notice by removing extra text based on the predictions.
+
+        Parameters:
+        data (iterable): The data to declutter.
+        predictions (list): The predictions indicating false positives.
+
+        Returns:
+        list: The decluttered data.
+        """
+
+        return self._call({
+            'method': 'declutter',
+            'data': [str(item) for item in data],
+            'predictions': list(predictions)
+        })
+
+    def analyze(self, data, threshold=0.5):
+        """
+        Predicts false positives and declutters the true positives in a single call.
+
+        Parameters:
+        data (iterable): The data to analyze.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+
+        Returns:
+        list: A (prediction, false positive probability, decluttered text) tuple for each string.
+        """
+
+        results = self._call({'method': 'analyze', 'data': [str(item) for item in data], 'threshold': threshold})
+        return [tuple(result) for result in results]
+
+    def close(self):
+        """
+        Closes the connection to the server.
+        """
+
+        self._file.close()
+        self._socket.close()
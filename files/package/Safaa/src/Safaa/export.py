@@ -0,0 +1,240 @@
+"""
+Export of the lighter 'fast' model variant used by SafaaAgent(model_variant='fast').
+
+Run it with `python -m Safaa export`. The fast variant is written to the 'fast'
+subdirectory of a model directory, or published as a new version of a model
+registry. It holds:
+
+- an entity recognizer with a narrower, shallower tok2vec and smaller embedding
+  tables (configs/fast/train.cfg),
+- a declutter model trained on top of that tok2vec, frozen, so both pipelines
+  share it and analyze runs it once per string,
+- the false positive detector, retrained on the masking of the fast entity
+  recognizer and optionally replaced by an L1-pruned sparse linear classifier.
+"""
+
+import os
+import shutil
+import tempfile
+from argparse import ArgumentParser
+from Safaa.Safaa import SafaaAgent, CONFIGS_DIR, FAST_MODEL_DIR
+
+# The training config of the fast entity recognizer
+FAST_CONFIGS_DIR = os.path.join(CONFIGS_DIR, FAST_MODEL_DIR)
+
+
+def declutter_config(entity_recognizer_path, config_path=None):
+    """
+    Builds the training config of a declutter model that shares the tok2vec of an entity recognizer.
+
+    The tok2vec component is sourced from the entity recognizer, frozen so its weights
+    stay identical, and annotating so the NER head listens to its predictions.
+
+    Parameters:
+    entity_recognizer_path (str): The directory of the trained entity recognizer.
+    config_path (str): The path to the directory holding train.cfg. Defaults to FAST_CONFIGS_DIR.
+
+    Returns:
+    Config: The training config.
+    """
+
+    from spacy.util import load_config
+
+    config = load_config(os.path.join(config_path or FAST_CONFIGS_DIR, 'train.cfg'))
+
+    # The listener cannot refer to the width of a sourced component, so set it explicitly
+    width = config['components']['tok2vec']['model']['encode']['width']
+    config['components']['ner']['model']['tok2vec']['width'] = width
+    config['components']['tok2vec'] = {'source': os.path.abspath(entity_recognizer_path)}
+    config['training']['frozen_components'] = ['tok2vec']
+    config['training']['annotating_components'] = ['tok2vec']
+    return config
+
+
+def train_pruned_classifier(agent, data, labels, C=10.0, batch_size=None, n_process=None):
+    """
+    Trains an L1-regularized logistic regression and prunes the features it does not use.
+
+    The vocabulary of the vectorizer is cut down to the terms with a non-zero weight and
+    the classifier is refitted on them, so both the vectorizer and the classifier shrink.
+
+    Parameters:
+    agent (SafaaAgent): The agent whose vectorizer and false positive detector are replaced.
+    data (iterable): The data to train the model on.
+    labels (iterable): The labels for the training data, 1 for false positives.
+    C (float): Inverse of the L1 regularization strength; smaller values keep fewer features. Defaults to 10.0.
+    batch_size (int): Overrides the agent's spaCy batch size. Defaults to None.
+    n_process (int): Overrides the agent's spaCy process count. Defaults to None.
+
+    Returns:
+    int: The number of features kept.
+    """
+
+    import numpy as np
+    from sklearn.base import clone
+    from sklearn.linear_model import LogisticRegression
+
+    labels = list(labels)
+    preprocessed_data = agent.preprocess_data(data, batch_size=batch_size, n_process=n_process)
+
+    # A memory-mapped vectorizer is read-only, so start from a scikit-learn one with the same parameters
+    # and a vocabulary learned from the data, even if the agent's vectorizer was pruned before
+    vectorizer = agent.vectorizer
+    if not hasattr(vectorizer, 'fit_transform'):
+        vectorizer = vectorizer.to_sklearn()
+    vectorizer = clone(vectorizer).set_params(vocabulary=None)
+
+    # Find the terms the L1-regularized classifier uses
+    classifier = LogisticRegression(penalty='l1', solver='liblinear', C=C)
+    classifier.fit(vectorizer.fit_transform(preprocessed_data), labels)
+    terms = vectorizer.get_feature_names_out()[np.flatnonzero(classifier.coef_[0])]
+
+    # Refit both on the kept terms only
+    vectorizer = clone(vectorizer).set_params(vocabulary=list(terms))
+    classifier = LogisticRegression(penalty='l1', solver='liblinear', C=C)
+    classifier.fit(vectorizer.fit_transform(preprocessed_data), labels)
+
+    agent.vectorizer = vectorizer
+    agent.false_positive_detector = classifier
+    return len(terms)
+
+
+def export_fast_models(model_dir, train_path, dev_path, declutter_train_path, declutter_dev_path, data=None,
+                       labels=None, prune=False, C=10.0, config_path=None, overrides=None, threads=None,
+                       epoch_callback=None, model_format='pickle'):
+    """
+    Trains the fast variant of the models and installs it next to the accurate ones.
+
+    Without training data for the false positive detector, the one of the accurate
+    variant is used as is.
+
+    Parameters:
+    model_dir (str): The model directory, or the root of a ModelRegistry to publish a new version to.
+    train_path (str): The training data of the entity recognizer, a .spacy file or a directory of them.
+    dev_path (str): The development data of the entity recognizer.
+    declutter_train_path (str): The training data of the declutter model.
+    declutter_dev_path (str): The development data of the declutter model.
+    data (iterable): The data to train the false positive detector on. Defaults to None.
+    labels (iterable): The labels for data, 1 for false positives. Defaults to None.
+    prune (bool): Whether to train an L1-pruned logistic regression instead of refitting the accurate
+        classifier. Defaults to False.
+    C (float): Inverse of the L1 regularization strength of the pruned classifier. Defaults to 10.0.
+    config_path (str): The path to the directory holding the train.cfg of the fast models. Defaults to FAST_CONFIGS_DIR.
+    overrides (dict): Extra config overrides of both trainings, e.g. {'training.max_steps': 5000}. Defaults to None.
+    threads (int): Maximum number of threads used by the BLAS and OpenMP thread pools. Defaults to None.
+    epoch_callback (callable): Called with the dict of every epoch of both trainings. Defaults to None.
+    model_format (str): 'pickle' or 'mmap' for a retrained false positive detector. Defaults to 'pickle'.
+
+    Returns:
+    str: The directory of the installed fast models.
+    """
+
+    from Safaa.registry import ModelRegistry
+
+    config_path = config_path or FAST_CONFIGS_DIR
+    registry = ModelRegistry(model_dir) if ModelRegistry.is_registry(model_dir) else None
+    source_dir = registry.current_path() if registry else model_dir
+
+    # Build the variant next to the model directory, so installing it is a rename
+    staging_path = tempfile.mkdtemp(prefix='.export-', dir=model_dir)
+    fast_path = os.path.join(staging_path, FAST_MODEL_DIR)
+    os.makedirs(fast_path)
+    try:
+        # Start from the false positive detector of the accurate variant
+        for name in os.listdir(source_dir):
+            if name.startswith('false_positive_detection_'):
+                if os.path.isdir(os.path.join(source_dir, name)):
+                    shutil.copytree(os.path.join(source_dir, name), os.path.join(fast_path, name))
+                else:
+                    shutil.copy2(os.path.join(source_dir, name), os.path.join(fast_path, name))
+        agent = SafaaAgent(model_dir=staging_path, model_variant='fast')
+
+        # Train the entity recognizer, then the declutter model on its frozen tok2vec
+        training_options = {'output_dir': fast_path, 'overrides': overrides, 'threads': threads, 'epoch_callback': epoch_callback}
+        agent.train_ner_model(train_path, dev_path, config_path=config_path, **training_options)
+        with tempfile.TemporaryDirectory() as declutter_config_path:
+            declutter_config(os.path.join(fast_path, 'entity_recognizer'), config_path).to_disk(
+                os.path.join(declutter_config_path, 'train.cfg')
+            )
+            agent.train_ner_model(
+                declutter_train_path, declutter_dev_path, declutter_model=True, config_path=declutter_config_path,
+                **training_options
+            )
+
+        # Retrain the false positive detector on the masking of the fast entity recognizer
+        if data is not None:
+            if prune:
+                train_pruned_classifier(agent, data, labels, C=C)
+            else:
+                agent.train_false_positive_detector_model(data, labels)
+            for name in os.listdir(fast_path):
+                if name.startswith('false_positive_detection_'):
+                    path = os.path.join(fast_path, name)
+                    if os.path.isdir(path) and not os.path.islink(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+            agent.save(staging_path, model_format=model_format)
+
+        # Publish or install the variant as a whole
+        if registry:
+            registry.publish(staging_path)
+            return os.path.join(registry.current_path(), FAST_MODEL_DIR)
+        agent._install_model(fast_path, os.path.join(model_dir, FAST_MODEL_DIR))
+        return os.path.join(model_dir, FAST_MODEL_DIR)
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+
+def add_arguments(parser):
+    """
+    Adds the command line arguments of the export to a parser.
+    """
+
+    parser.add_argument("--model-dir", required=True, help="Model directory or registry root to export the fast variant to")
+    parser.add_argument("--train", required=True, help="Training data of the entity recognizer (.spacy file or directory)")
+    parser.add_argument("--dev", required=True, help="Development data of the entity recognizer")
+    parser.add_argument("--declutter-train", required=True, help="Training data of the declutter model")
+    parser.add_argument("--declutter-dev", required=True, help="Development data of the declutter model")
+    parser.add_argument("--csv-file", default=None,
+                        help="CSV file to retrain the false positive detector on; the accurate one is reused otherwise")
+    parser.add_argument("--text-column", default="copyright", help="CSV column holding the copyright strings")
+    parser.add_argument("--label-column", default="falsePositive", help="CSV column holding the labels, 1 for false positives")
+    parser.add_argument("--prune", action="store_true", help="Train an L1-pruned logistic regression as the false positive detector")
+    parser.add_argument("--C", type=float, default=10.0, help="Inverse L1 regularization strength of the pruned classifier")
+    parser.add_argument("--max-steps", type=int, default=None, help="Maximum number of training steps of each spaCy model")
+    parser.add_argument("--threads", type=int, default=None, help="Maximum number of threads used for training")
+    parser.add_argument("--model-format", default="pickle", choices=("pickle", "mmap"),
+                        help="Format of a retrained false positive detector")
+
+
+def main(args):
+    """
+    Exports the fast variant from the parsed `python -m Safaa export` arguments.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line arguments.
+    """
+
+    data = labels = None
+    if args.csv_file:
+        import pandas as pd
+        frame = pd.read_csv(args.csv_file)
+        data, labels = frame[args.text_column].astype(str).to_list(), frame[args.label_column].to_list()
+
+    def print_epoch(epoch):
+        score = f"score {epoch['score']:.4f}" if epoch['score'] is not None else 'not evaluated'
+        print(f"epoch {epoch['epoch']}, step {epoch['step']}: {score} in {epoch['seconds']:.1f} s", flush=True)
+
+    fast_path = export_fast_models(
+        args.model_dir, args.train, args.dev, args.declutter_train, args.declutter_dev, data=data, labels=labels,
+        prune=args.prune, C=args.C, overrides={'training.max_steps': args.max_steps} if args.max_steps else None,
+        threads=args.threads, epoch_callback=print_epoch, model_format=args.model_format
+    )
+    print(f"Exported the fast models to {fast_path}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(prog="python -m Safaa.export", description="Export the fast variant of the Safaa models")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,74 @@
+"""
+TextNormalizer: Precompiled text normalization used by the SafaaAgent preprocessing step.
+"""
+
+import re
+
+# Four-digit numbers are assumed to be years
+DATE_PATTERN = re.compile(r'\d{4}')
+NUMBER_PATTERN = re.compile(r'\d+')
+# '©', '(c)' and '(C)' can never overlap, so a single alternation is equivalent to three passes
+COPYRIGHT_SYMBOL_PATTERN = re.compile(r'©|\(c\)|\(C\)')
+EMAIL_PATTERN = re.compile(r"""(?:[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*|"(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21\x23-\x5b\x5d-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])*")@(?:(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?|\[(?:(?:(2(5[0-5]|[0-4][0-9])|1[0-9][0-9]|[1-9]?[0-9]))\.){3}(?:(2(5[0-5]|[0-4][0-9])|1[0-9][0-9]|[1-9]?[0-9])|[a-z0-9-]*[a-z0-9]:(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21-\x5a\x53-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])+)\])""")
+SPECIAL_CHARACTER_PATTERN = re.compile(r'[^a-zA-Z0-9]')
+
+# Byte table that turns ASCII special characters into spaces and lowercases ASCII letters
+ASCII_TABLE = bytes(
+    byte if byte < 128 and chr(byte).isalnum() else ord(' ')
+    for byte in range(256)
+).lower()
+
+
+class TextNormalizer:
+    """
+    Cleans and standardizes copyright strings one string at a time using precompiled patterns.
+
+    Gives exactly the same output as applying the substitutions one after another:
+    - Replacing four-digit numbers (assumed to be years) with ' DATE '.
+    - Removing all other numbers.
+    - Replacing copyright symbols with ' COPYRIGHTSYMBOL '.
+    - Replacing emails with ' EMAIL '.
+    - Removing any special characters not already replaced or removed.
+    - Converting text to lowercase.
+    - Stripping extra whitespace from the text.
+    """
+
+    def __call__(self, data):
+        """
+        Normalizes every string in the given data.
+
+        Parameters:
+        data (iterable): The strings to normalize.
+
+        Returns:
+        list: A list of cleaned and standardized strings.
+        """
+
+        normalize = self.normalize
+        return [normalize(sentence) for sentence in data]
+
+    def normalize(self, sentence):
+        """
+        Normalizes a single string.
+
+        Parameters:
+        sentence (str): The string to normalize.
+
+        Returns:
+        str: The cleaned and standardized string.
+        """
+
+        # Replace years with ' DATE ' and remove all other numbers
+        sentence = NUMBER_PATTERN.sub(' ', DATE_PATTERN.sub(' DATE ', sentence))
+        # Replace all copyright symbol spellings in one pass
+        sentence = COPYRIGHT_SYMBOL_PATTERN.sub(' COPYRIGHTSYMBOL ', sentence)
+        # The email pattern can only match around an '@', so skip it otherwise
+        if '@' in sentence:
+            sentence = EMAIL_PATTERN.sub(' EMAIL ', sentence)
+        try:
+            encoded = sentence.encode('ascii')
+        except UnicodeEncodeError:
+            # Non-ASCII characters are special characters, replace them before the byte translation
+            encoded = SPECIAL_CHARACTER_PATTERN.sub(' ', sentence).encode('ascii')
+        # Replace the remaining special characters and lowercase in one translation
+        return encoded.translate(ASCII_TABLE).decode('ascii').strip()
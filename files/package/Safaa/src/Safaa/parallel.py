@@ -0,0 +1,200 @@
+"""
+ParallelSafaaAgent: Runs SafaaAgent inference on a pool of worker processes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from Safaa.Safaa import SafaaAgent
+
+# The agent of the current worker process, created once by the pool initializer
+_worker_agent = None
+
+
+def _initialize_worker(agent_kwargs):
+    """
+    Pool initializer that loads the models once per worker process.
+
+    Parameters:
+    agent_kwargs (dict): Keyword arguments passed to SafaaAgent.
+    """
+
+    global _worker_agent
+    _worker_agent = SafaaAgent(**agent_kwargs)
+    _worker_agent._load_models()
+
+
+def _run_in_worker(method, args, kwargs):
+    """
+    Runs a SafaaAgent method on the agent of the current worker process.
+
+    Parameters:
+    method (str): The name of the SafaaAgent method to call.
+    args (tuple): Positional arguments of the call, e.g. a shard of the input data.
+    kwargs (dict): Keyword arguments of the call.
+
+    Returns:
+    list: The results of the shard.
+    """
+
+    return getattr(_worker_agent, method)(*args, **kwargs)
+
+
+class ParallelSafaaAgent:
+    """
+    Shards SafaaAgent inference across worker processes and merges the results in input order.
+
+    Each worker process loads the models once, when the pool starts. If a worker crashes,
+    e.g. because it was killed by the OOM killer, the pool is restarted and only the
+    shards that did not finish are resubmitted.
+    """
+
+    def __init__(self, workers=None, chunk_size=1000, max_retries=1, mp_context=None, **agent_kwargs):
+        """
+        Initializes the ParallelSafaaAgent. The worker pool is started on first use.
+
+        Parameters:
+        workers (int): Number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int): Number of strings sent to a worker at a time. Defaults to 1000.
+        max_retries (int): How many times a pool is restarted after a worker crash. Defaults to 1.
+        mp_context (multiprocessing.context.BaseContext): Context used to start the workers. Defaults to None.
+        agent_kwargs: Keyword arguments passed to the SafaaAgent of every worker.
+        """
+
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.mp_context = mp_context
+
+        # Every worker runs single process spaCy pipelines, the parallelism comes from the pool
+        self.agent_kwargs = dict(agent_kwargs, n_process=1)
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_executor(self):
+        """
+        Internal helper that starts the worker pool if it is not running.
+
+        Returns:
+        ProcessPoolExecutor: The worker pool.
+        """
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self.mp_context,
+                initializer=_initialize_worker,
+                initargs=(self.agent_kwargs,)
+            )
+        return self._executor
+
+    def _map(self, method, shards, kwargs):
+        """
+        Internal helper that runs a method over every shard and merges the results in order.
+
+        Parameters:
+        method (str): The name of the SafaaAgent method to call.
+        shards (list): The positional arguments of each shard.
+        kwargs (dict): Keyword arguments passed to every call.
+
+        Returns:
+        list: The merged results.
+
+        Raises:
+        RuntimeError: If the workers keep crashing after max_retries pool restarts.
+        """
+
+        results = {}
+        for attempt in range(self.max_retries + 1):
+            executor = self._get_executor()
+            pending = [index for index in range(len(shards)) if index not in results]
+            futures = {}
+            try:
+                for index in pending:
+                    futures[index] = executor.submit(_run_in_worker, method, shards[index], kwargs)
+                for index, future in futures.items():
+                    results[index] = future.result()
+                break
+            except BrokenProcessPool as error:
+                # Keep the shards that finished before the crash and restart the pool
+                for index, future in futures.items():
+                    if future.done() and not future.cancelled() and future.exception() is None:
+                        results[index] = future.result()
+                self.close()
+                if attempt == self.max_retries:
+                    raise RuntimeError(
+                        f"A SafaaAgent worker process crashed {attempt + 1} time(s) while running {method}"
+                    ) from error
+
+        return [result for index in range(len(shards)) for result in results[index]]
+
+    def _shard(self, data, chunk_size=None):
+        """
+        Internal helper that splits a list into chunks of chunk_size items, defaulting to self.chunk_size.
+        """
+
+        chunk_size = chunk_size or self.chunk_size
+        return [data[start:start + chunk_size] for start in range(0, len(data), chunk_size)]
+
+    def predict(self, data, threshold=0.5, chunk_size=None):
+        """
+        Predicts false positives in the given data using the worker pool.
+
+        Parameters:
+        data (iterable): The data to predict.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+        chunk_size (int): Overrides the number of strings sent to a worker at a time. Defaults to None.
+
+        Returns:
+        list: The predictions.
+        """
+
+        data = [str(item) for item in data]
+        return self._map('predict', [(shard,) for shard in self._shard(data, chunk_size)], {'threshold': threshold})
+
+    def declutter(self, data, predictions, chunk_size=None):
+        """
+        Cleans up copyright notices based on the predictions using the worker pool.
+
+        Parameters:
+        data (iterable): The data to declutter.
+        predictions (list): The predictions indicating false positives.
+        chunk_size (int): Overrides the number of strings sent to a worker at a time. Defaults to None.
+
+        Returns:
+        list: The decluttered data.
+        """
+
+        data = [str(item) for item in data]
+        predictions = list(predictions)
+        return self._map('declutter', list(zip(self._shard(data, chunk_size), self._shard(predictions, chunk_size))), {})
+
+    def analyze(self, data, threshold=0.5, chunk_size=None):
+        """
+        Predicts false positives and declutters the true positives using the worker pool.
+
+        Parameters:
+        data (iterable): The data to analyze.
+        threshold (float): The probability threshold for classification. Defaults to 0.5.
+        chunk_size (int): Overrides the number of strings sent to a worker at a time. Defaults to None.
+
+        Returns:
+        list: A (prediction, false positive probability, decluttered text) tuple for each string.
+        """
+
+        data = [str(item) for item in data]
+        return self._map('analyze', [(shard,) for shard in self._shard(data, chunk_size)], {'threshold': threshold})
+
+    def close(self):
+        """
+        Shuts down the worker pool. It is started again on the next call.
+        """
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
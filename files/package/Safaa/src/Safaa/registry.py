@@ -0,0 +1,183 @@
+"""
+ModelRegistry: A directory of immutable model versions with an atomically switched current version.
+
+The layout of a registry root is:
+
+    versions/<version>/   one complete set of models per version
+    current               symlink to the active version, e.g. versions/20231001T120000
+
+New versions are staged in a hidden directory and renamed into versions/ once
+complete, and current is switched by renaming a new symlink over it, so readers
+never see a half-written model.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+
+# Constants
+VERSIONS_DIR = 'versions'
+CURRENT_LINK = 'current'
+
+
+class ModelRegistry:
+    """
+    Publishes and activates versions of the SafaaAgent models under a registry root.
+    """
+
+    def __init__(self, root):
+        """
+        Opens or creates the registry.
+
+        Parameters:
+        root (str): The registry root directory.
+        """
+
+        self.root = root
+        self.versions_dir = os.path.join(root, VERSIONS_DIR)
+        self.current_link = os.path.join(root, CURRENT_LINK)
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    @staticmethod
+    def is_registry(path):
+        """
+        Checks whether a directory is a registry root with an active version.
+        """
+
+        return os.path.islink(os.path.join(path, CURRENT_LINK)) and os.path.isdir(os.path.join(path, VERSIONS_DIR))
+
+    def versions(self):
+        """
+        Returns the published versions, oldest first.
+        """
+
+        return sorted(name for name in os.listdir(self.versions_dir) if not name.startswith('.'))
+
+    def current_version(self):
+        """
+        Returns the active version, or None if no version has been activated.
+        """
+
+        if not os.path.islink(self.current_link):
+            return None
+        return os.path.basename(os.readlink(self.current_link))
+
+    def current_path(self):
+        """
+        Returns the directory of the active version.
+
+        Raises:
+        FileNotFoundError: If no version has been activated.
+        """
+
+        version = self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"No active model version in {self.root}")
+        return os.path.join(self.versions_dir, version)
+
+    def publish(self, source_dir, version=None, base=None, activate=True, exclude=()):
+        """
+        Publishes a new version made of the files of source_dir on top of a base version.
+
+        Files and model directories of the base version that source_dir does not contain
+        are hard-linked into the new version, so publishing a single retrained model
+        neither copies nor drops the other models.
+
+        Parameters:
+        source_dir (str): The directory holding the new model files, e.g. 'entity_recognizer'.
+        version (str): Name of the new version. Defaults to a timestamp.
+        base (str): The version to start from. Defaults to the active version, if any.
+        activate (bool): Whether to make the new version the active one. Defaults to True.
+        exclude (iterable): Names of files or directories of the base version to leave out, e.g. the other
+            format of a replaced model. Defaults to ().
+
+        Returns:
+        str: The name of the new version.
+
+        Raises:
+        FileExistsError: If the version already exists.
+        """
+
+        if version is None:
+            # Name the version after the current time, counting up if that name is taken
+            timestamp = version = time.strftime('%Y%m%dT%H%M%S')
+            count = 0
+            while os.path.exists(os.path.join(self.versions_dir, version)):
+                count += 1
+                version = f'{timestamp}-{count}'
+        version_path = os.path.join(self.versions_dir, version)
+        if os.path.exists(version_path):
+            raise FileExistsError(f"Model version {version} already exists in {self.root}")
+
+        staging_path = tempfile.mkdtemp(prefix='.staging-', dir=self.versions_dir)
+        try:
+            # Link the models of the base version that are not replaced
+            base = base or self.current_version()
+            # Hidden entries, e.g. the installs behind a model symlink, are not models of their own
+            replaced = {name for name in os.listdir(source_dir) if not name.startswith('.')}
+            skipped = replaced | set(exclude)
+            if base is not None:
+                base_path = os.path.join(self.versions_dir, base)
+                for name in os.listdir(base_path):
+                    if name in skipped:
+                        continue
+                    if os.path.isdir(os.path.join(base_path, name)):
+                        shutil.copytree(os.path.join(base_path, name), os.path.join(staging_path, name),
+                                        copy_function=os.link)
+                    else:
+                        os.link(os.path.join(base_path, name), os.path.join(staging_path, name))
+
+            # Copy the new models
+            for name in replaced:
+                if os.path.isdir(os.path.join(source_dir, name)):
+                    shutil.copytree(os.path.join(source_dir, name), os.path.join(staging_path, name))
+                else:
+                    shutil.copy2(os.path.join(source_dir, name), os.path.join(staging_path, name))
+
+            # The version appears complete or not at all
+            os.chmod(staging_path, 0o755)
+            os.rename(staging_path, version_path)
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """
+        Makes a published version the active one.
+
+        Parameters:
+        version (str): The version to activate.
+
+        Raises:
+        FileNotFoundError: If the version does not exist.
+        """
+
+        if not os.path.isdir(os.path.join(self.versions_dir, version)):
+            raise FileNotFoundError(f"Model version {version} does not exist in {self.root}")
+
+        # Point a new symlink at the version and rename it over the current one
+        tmp_link = f'{self.current_link}.tmp-{os.getpid()}'
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(os.path.join(VERSIONS_DIR, version), tmp_link)
+        os.replace(tmp_link, self.current_link)
+
+    def remove(self, version):
+        """
+        Deletes a published version that is not active.
+
+        Parameters:
+        version (str): The version to delete.
+
+        Raises:
+        ValueError: If the version is the active one.
+        """
+
+        if version == self.current_version():
+            raise ValueError(f"Cannot remove the active model version {version}")
+        shutil.rmtree(os.path.join(self.versions_dir, version))
@@ -0,0 +1,126 @@
+"""
+RuleClassifier: A rule-based pre-classifier that decides obvious strings before the SafaaAgent models.
+"""
+
+import re
+import csv
+import hashlib
+from Safaa.normalizer import TextNormalizer
+
+# Patterns of strings whose verdict is obvious, checked in order, with 't' for true and 'f' for false positives
+DEFAULT_PATTERNS = [
+    # File paths of the FOSSology copyright agent, e.g. 'copyright/agent_tests/testdata/testdata9'
+    (r'^\s*copyright/', 'f'),
+    # A copyright marker with nothing after it, e.g. 'Copyright (C)'
+    (r'^\s*(?:(?:[Cc]opyright|COPYRIGHT)\s*(?:\([Cc]\)|©)?|\([Cc]\)|©)\s*[:.]?\s*$', 'f'),
+    # The canonical 'Copyright (c) <years> <holder>' form, e.g. 'Copyright (C) 2003, 2012 Mark Adler'
+    (r"^\s*(?:[Cc]opyright|COPYRIGHT)\s*(?:\([Cc]\)|©)?\s*\d{4}(?:\s*[-,]\s*\d{4})*\s*,?\s*(?:by\s+)?"
+     r"[A-Z][\w&'-]+\.?(?:,?\s+(?:[A-Z][\w&'.-]*|and|&|of))*\s*\.?\s*$", 't'),
+]
+
+
+class RuleClassifier:
+    """
+    Decides strings from a table of known verdicts and a set of compiled patterns.
+
+    The exact-match table is checked first, then the patterns in order. Optionally,
+    strings the TextNormalizer turns into nothing, e.g. '(12)' or '名前', are false
+    positives; this rule is off by default, since the models see the string after
+    entity masking and can still find a copyright in it. Strings no rule decides are
+    left to the models.
+    """
+
+    def __init__(self, exact=None, patterns=DEFAULT_PATTERNS, empty_is_false_positive=False):
+        """
+        Initializes the rules.
+
+        Parameters:
+        exact (dict): Known verdicts, 't' or 'f', keyed on the raw string. Defaults to None.
+        patterns (iterable): (pattern, verdict) pairs of regular expressions and their verdict, 't' or 'f'.
+            Defaults to DEFAULT_PATTERNS.
+        empty_is_false_positive (bool): Whether strings that normalize to nothing are false positives. Defaults to False.
+
+        Raises:
+        ValueError: If a verdict is not 't' or 'f'.
+        """
+
+        self.exact = dict(exact or {})
+        self.patterns = [(re.compile(pattern), verdict) for pattern, verdict in patterns]
+        self.empty_is_false_positive = empty_is_false_positive
+        self.text_normalizer = TextNormalizer()
+
+        for verdict in list(self.exact.values()) + [verdict for _, verdict in self.patterns]:
+            if verdict not in ('t', 'f'):
+                raise ValueError(f"Unknown verdict: {verdict!r}")
+
+    @classmethod
+    def from_csv(cls, path, text_column='copyright', label_column='falsePositive', **kwargs):
+        """
+        Builds the exact-match table from a labeled CSV file, e.g. the false positive detection dataset.
+
+        Strings labeled both ways are left to the models.
+
+        Parameters:
+        path (str): Path to the CSV file.
+        text_column (str): Column holding the copyright strings. Defaults to 'copyright'.
+        label_column (str): Column holding the labels, 1 for false positives. Defaults to 'falsePositive'.
+        kwargs: Other keyword arguments passed to RuleClassifier.
+
+        Returns:
+        RuleClassifier: The rules with the table of known verdicts.
+        """
+
+        exact, conflicting = {}, set()
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                text = row[text_column]
+                verdict = 'f' if int(float(row[label_column])) == 1 else 't'
+                if exact.setdefault(text, verdict) != verdict:
+                    conflicting.add(text)
+        for text in conflicting:
+            del exact[text]
+        return cls(exact=exact, **kwargs)
+
+    def decide(self, data):
+        """
+        Decides every string a rule applies to.
+
+        Parameters:
+        data (list): A list of strings.
+
+        Returns:
+        list: A (verdict, rule) tuple for each decided string, with rule one of 'exact', 'pattern'
+            or 'empty', and None for the strings left to the models.
+        """
+
+        decisions = []
+        for sentence in data:
+            decision = None
+            if sentence in self.exact:
+                decision = (self.exact[sentence], 'exact')
+            else:
+                for pattern, verdict in self.patterns:
+                    if pattern.match(sentence):
+                        decision = (verdict, 'pattern')
+                        break
+                else:
+                    if self.empty_is_false_positive and not self.text_normalizer.normalize(sentence):
+                        decision = ('f', 'empty')
+            decisions.append(decision)
+        return decisions
+
+    def fingerprint(self):
+        """
+        Computes a fingerprint of the rules, so cached results are not shared between different rules.
+
+        Returns:
+        str: The hex digest identifying the rules.
+        """
+
+        digest = hashlib.sha256()
+        for text, verdict in sorted(self.exact.items()):
+            digest.update(f'{len(text)}:{text}:{verdict}\n'.encode('utf-8'))
+        for pattern, verdict in self.patterns:
+            digest.update(f'{pattern.pattern}:{verdict}\n'.encode('utf-8'))
+        digest.update(f'normalized-empty:{self.empty_is_false_positive}\n'.encode('utf-8'))
+        return digest.hexdigest()
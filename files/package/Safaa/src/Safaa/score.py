@@ -0,0 +1,356 @@
+"""
+Batch scoring of whole-upload CSV or JSONL files of copyright findings.
+
+Run it with `python -m Safaa score findings.csv results.csv`. The input is streamed
+in chunks, every chunk is analyzed and appended to the output, and a checkpoint next
+to the output records how far the run got, so an interrupted run resumes where it
+stopped instead of starting over.
+"""
+
+import io
+import os
+import csv
+import sys
+import json
+import time
+from argparse import ArgumentParser
+
+# Columns added to every input row
+RESULT_COLUMNS = ('prediction', 'probability', 'decluttered')
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+def read_rows(path):
+    """
+    Streams the rows of a CSV or JSONL file.
+
+    Parameters:
+    path (str): Path to the input. Files ending in .jsonl are read as JSON lines, any other file as CSV with a header.
+
+    Yields:
+    tuple: The number of bytes of the file read so far and the row as a dict.
+    """
+
+    # Copyright findings can be far longer than the default field size limit of the csv module
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+    with open(path, 'rb') as raw:
+        text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        if path.endswith('.jsonl'):
+            rows = (json.loads(line) for line in text if line.strip())
+        else:
+            rows = csv.DictReader(text)
+        for row in rows:
+            yield raw.tell(), row
+
+
+class _FileWriter:
+    """
+    Appends rows to a single output file, starting from a known size.
+    """
+
+    def __init__(self, path, position):
+        # Drop whatever was written after the last checkpoint
+        self._raw = open(path, 'r+b' if position else 'wb')
+        self._raw.truncate(position)
+        self._raw.seek(position)
+        self.file = io.TextIOWrapper(self._raw, encoding='utf-8', newline='')
+
+    def position(self):
+        """
+        Makes the rows written so far durable and returns the size of the file.
+        """
+
+        self.file.flush()
+        os.fsync(self._raw.fileno())
+        return self._raw.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class _CsvWriter(_FileWriter):
+    """
+    Appends rows to a CSV file, with the columns of the first row in the header.
+    """
+
+    def __init__(self, path, position):
+        # A resumed file keeps the header it was started with
+        self.fieldnames = None
+        if position:
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                self.fieldnames = next(csv.reader(file))
+        super().__init__(path, position)
+
+    def write(self, rows):
+        if self.fieldnames is None:
+            self.fieldnames = list(rows[0])
+            csv.writer(self.file).writerow(self.fieldnames)
+        csv.DictWriter(self.file, self.fieldnames, restval='', extrasaction='ignore').writerows(rows)
+
+
+class _JsonlWriter(_FileWriter):
+    """
+    Appends rows to a JSONL file.
+    """
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row) + '\n')
+
+
+class _ParquetWriter:
+    """
+    Writes every chunk of rows as a part file of a Parquet dataset directory.
+    """
+
+    def __init__(self, path, position):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError("Writing Parquet output requires pyarrow: pip install pyarrow") from error
+        self._pyarrow = pyarrow
+
+        self.path = path
+        self.parts = position
+        os.makedirs(path, exist_ok=True)
+
+        # Drop the parts written after the last checkpoint
+        for name in os.listdir(path):
+            if name.startswith('part-') and name.endswith('.parquet') and int(name[5:-8]) >= position:
+                os.remove(os.path.join(path, name))
+
+    def write(self, rows):
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        table = self._pyarrow.table({column: [row.get(column) for row in rows] for column in columns})
+
+        # Every part appears complete or not at all
+        part_path = os.path.join(self.path, f'part-{self.parts:05d}.parquet')
+        self._pyarrow.parquet.write_table(table, part_path + '.tmp')
+        os.replace(part_path + '.tmp', part_path)
+        self.parts += 1
+
+    def position(self):
+        return self.parts
+
+    def close(self):
+        pass
+
+
+WRITERS = {'csv': _CsvWriter, 'jsonl': _JsonlWriter, 'parquet': _ParquetWriter}
+
+
+def _save_checkpoint(path, checkpoint):
+    """
+    Internal helper that replaces the checkpoint file atomically.
+    """
+
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _model_fingerprint(agent):
+    """
+    Internal helper that identifies the models and settings an agent scores with.
+
+    Parameters:
+    agent (SafaaAgent): The agent, or a ParallelSafaaAgent, used to analyze the strings.
+
+    Returns:
+    str: The fingerprint of the agent's models, or None for other agents.
+    """
+
+    from Safaa.Safaa import SafaaAgent
+    from Safaa.parallel import ParallelSafaaAgent
+
+    # The workers of a ParallelSafaaAgent build their agents from its keyword arguments; the models load lazily
+    if isinstance(agent, ParallelSafaaAgent):
+        agent = SafaaAgent(**agent.agent_kwargs)
+    if isinstance(agent, SafaaAgent):
+        return agent._model_fingerprint()
+    return None
+
+
+def score_file(agent, input_path, output_path, column=None, threshold=0.5, chunk_size=10000,
+               output_format=None, restart=False, progress=None):
+    """
+    Analyzes every row of a CSV or JSONL file and writes the rows with their results, one chunk at a time.
+
+    Every output row holds the input row and its prediction, false positive probability
+    and decluttered text. After every chunk the output is flushed to disk and the
+    checkpoint output_path + '.checkpoint' records the rows done and the output size.
+    A later run with the same options and models truncates the output to that size and
+    skips the rows done. The checkpoint is removed once the whole file is scored.
+
+    Parameters:
+    agent (SafaaAgent): The agent, or a ParallelSafaaAgent, used to analyze the strings.
+    input_path (str): Path to the CSV or JSONL input.
+    output_path (str): Path to the output file, or directory of part files for Parquet.
+    column (str): CSV column or JSONL key holding the strings. Defaults to the first CSV column or the 'text' key.
+    threshold (float): The probability threshold for classification. Defaults to 0.5.
+    chunk_size (int): Number of rows analyzed and written at a time. Defaults to 10000.
+    output_format (str): 'csv', 'jsonl' or 'parquet'. Defaults to the extension of output_path.
+    restart (bool): Whether to ignore an existing checkpoint and start over. Defaults to False.
+    progress (callable): Called as progress(rows_done, rows_per_second, eta_seconds) after every chunk,
+        with eta_seconds None until it can be estimated. Defaults to None.
+
+    Returns:
+    int: The number of rows of the input.
+
+    Raises:
+    ValueError: If the output format is unknown, or the checkpoint was made with other options or models.
+    """
+
+    output_format = output_format or os.path.splitext(output_path)[1].lstrip('.')
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown output format: {output_format!r}")
+
+    # Resume from the checkpoint of an interrupted run with the same options, models, variant, rules and length limit
+    checkpoint_path = output_path.rstrip(os.sep) + '.checkpoint'
+    options = {
+        'input': os.path.abspath(input_path), 'column': column, 'threshold': threshold, 'format': output_format,
+        'models': _model_fingerprint(agent)
+    }
+    checkpoint = dict(options, rows_done=0, output_position=0)
+    if os.path.exists(checkpoint_path) and not restart:
+        with open(checkpoint_path, 'r', encoding='utf-8') as file:
+            saved = json.load(file)
+        if {key: saved.get(key) for key in options} != options:
+            raise ValueError(
+                f"{checkpoint_path} belongs to a run with other options or models; start over with restart=True or --restart"
+            )
+        checkpoint = saved
+
+    writer = WRITERS[output_format](output_path, checkpoint['output_position'])
+    total_size = os.path.getsize(input_path)
+    start_time, start_position, rows_scored = None, None, 0
+    try:
+        rows = read_rows(input_path)
+
+        # Skip the rows done by the interrupted run
+        position = 0
+        for _ in range(checkpoint['rows_done']):
+            position, _ = next(rows)
+
+        chunk = []
+        start_time, start_position = time.perf_counter(), position
+        while True:
+            for position, row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    break
+            if not chunk:
+                break
+
+            # Analyze the chunk and append the rows with their results
+            key = column or ('text' if input_path.endswith('.jsonl') else next(iter(chunk[0])))
+            results = agent.analyze([str(row[key]) for row in chunk], threshold=threshold)
+            for row, result in zip(chunk, results):
+                row.update(zip(RESULT_COLUMNS, result))
+            writer.write(chunk)
+
+            # Record the progress only once the output is on disk
+            rows_scored += len(chunk)
+            checkpoint['rows_done'] += len(chunk)
+            checkpoint['output_position'] = writer.position()
+            _save_checkpoint(checkpoint_path, checkpoint)
+            chunk = []
+
+            if progress is not None:
+                seconds = time.perf_counter() - start_time
+                eta = None
+                if position > start_position:
+                    eta = (total_size - position) * seconds / (position - start_position)
+                progress(checkpoint['rows_done'], rows_scored / seconds, eta)
+    finally:
+        writer.close()
+
+    # The whole file is scored, so a later run starts over
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return checkpoint['rows_done']
+
+
+def _format_duration(seconds):
+    """
+    Internal helper that formats a duration as H:MM:SS.
+    """
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}'
+
+
+def _print_progress(rows_done, rows_per_second, eta):
+    """
+    Internal helper that prints the progress of a scoring run.
+    """
+
+    eta = _format_duration(eta) if eta is not None else '?'
+    print(f"{rows_done:,} rows done, {rows_per_second:,.0f} rows/s, ETA {eta}", file=sys.stderr, flush=True)
+
+
+def add_arguments(parser):
+    """
+    Adds the command line arguments of the scoring command to a parser.
+    """
+
+    parser.add_argument("input", help="CSV or JSONL file of copyright findings")
+    parser.add_argument("output", help="Output file ending in .csv or .jsonl, or directory ending in .parquet")
+    parser.add_argument("--column", default=None, help="CSV column or JSONL key holding the strings; defaults to the first CSV column or 'text'")
+    parser.add_argument("--format", default=None, choices=FORMATS, help="Output format; defaults to the extension of the output")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to score with")
+    parser.add_argument("--model-variant", default="accurate", choices=("accurate", "fast"),
+                        help="Score with the accurate models or the fast ones exported by python -m Safaa export")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Batch size used by the spaCy pipelines")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Number of rows scored and written between checkpoints")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Probability threshold for false positives")
+    parser.add_argument("--max-length", type=int, default=None, help="Truncate strings to this many characters")
+    parser.add_argument("--rules", action="store_true", help="Decide obvious strings with the default rules before the models")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run and start over")
+
+
+def main(args):
+    """
+    Scores a file from the parsed `python -m Safaa score` arguments.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line arguments.
+    """
+
+    agent_kwargs = {
+        'model_dir': args.model_dir, 'model_variant': args.model_variant, 'batch_size': args.batch_size,
+        'max_length': args.max_length
+    }
+    if args.rules:
+        from Safaa.rules import RuleClassifier
+        agent_kwargs['rules'] = RuleClassifier()
+
+    if args.workers > 1:
+        from Safaa.parallel import ParallelSafaaAgent
+        agent = ParallelSafaaAgent(workers=args.workers, chunk_size=max(1, args.chunk_size // args.workers), **agent_kwargs)
+    else:
+        from Safaa.Safaa import SafaaAgent
+        agent = SafaaAgent(**agent_kwargs)
+
+    start = time.perf_counter()
+    try:
+        rows = score_file(
+            agent, args.input, args.output, column=args.column, threshold=args.threshold,
+            chunk_size=args.chunk_size, output_format=args.format, restart=args.restart, progress=_print_progress
+        )
+    finally:
+        if args.workers > 1:
+            agent.close()
+    print(f"Scored {rows:,} rows into {args.output} in {_format_duration(time.perf_counter() - start)}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(prog="python -m Safaa.score", description="Score a CSV or JSONL file of copyright findings")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,319 @@
+"""
+SafaaServer: A long-lived inference server that keeps the SafaaAgent models resident.
+
+Clients send one JSON object per line and receive one JSON object per line back.
+Requests look like {"method": "predict", "data": [...], "threshold": 0.5},
+{"method": "declutter", "data": [...], "predictions": [...]} or
+{"method": "analyze", "data": [...], "threshold": 0.5}, and responses look like
+{"result": [...]} or {"error": "..."}. Concurrent requests are coalesced into
+micro-batches before they reach the agent. {"method": "reload"} loads the latest
+models, e.g. a newly activated registry version, without pausing the other requests.
+"""
+
+import os
+import json
+import time
+import queue
+import tempfile
+import threading
+import socketserver
+from concurrent.futures import Future
+from Safaa.Safaa import SafaaAgent
+
+# Constants
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), 'safaa.sock')
+DEFAULT_PORT = 7428
+METHODS = ('predict', 'declutter', 'analyze')
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into micro-batches that are run on a single agent.
+
+    A batch is flushed as soon as it holds max_batch_size strings, or max_latency
+    seconds after its first request arrived, whichever comes first.
+    """
+
+    def __init__(self, agent, max_batch_size=1000, max_latency=0.01):
+        """
+        Initializes the MicroBatcher and starts its worker thread.
+
+        Parameters:
+        agent (SafaaAgent): The agent that runs the batches.
+        max_batch_size (int): Maximum number of strings per batch. Defaults to 1000.
+        max_latency (float): Maximum seconds a request waits for a batch to fill. Defaults to 0.01.
+        """
+
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='safaa-micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, method, items, options=()):
+        """
+        Queues a request.
+
+        Parameters:
+        method (str): One of 'predict', 'declutter' or 'analyze'.
+        items (list): The strings of the request, or (string, prediction) pairs for 'declutter'.
+        options (tuple): Sorted (name, value) pairs of keyword arguments, e.g. the threshold. Defaults to ().
+
+        Returns:
+        Future: Resolves to the results of this request only.
+        """
+
+        future = Future()
+        self._queue.put((method, options, items, future))
+        return future
+
+    def _run(self):
+        """
+        Internal worker loop that collects requests into batches and runs them.
+        """
+
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+
+            # Keep collecting requests until the batch is full or the latency bound is reached
+            batch = [request]
+            size = len(request[2])
+            deadline = time.monotonic() + self.max_latency
+            stopping = False
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                size += len(request[2])
+
+            self._process(batch)
+            if stopping:
+                return
+
+    def _process(self, batch):
+        """
+        Internal helper that runs a batch, grouping requests with the same method and options.
+
+        If the call of a group fails, every request of the group is run on its own, so only
+        the failing requests get the error.
+
+        Parameters:
+        batch (list): The queued (method, options, items, future) requests.
+        """
+
+        groups = {}
+        for method, options, items, future in batch:
+            groups.setdefault((method, options), []).append((items, future))
+
+        for (method, options), requests in groups.items():
+            items = [item for request_items, _ in requests for item in request_items]
+            try:
+                results = self._call(method, options, items)
+            except Exception as error:
+                if len(requests) == 1:
+                    requests[0][1].set_exception(error)
+                    continue
+
+                # Find the failing requests by running each one on its own
+                for request_items, future in requests:
+                    try:
+                        future.set_result(self._call(method, options, request_items))
+                    except Exception as request_error:
+                        future.set_exception(request_error)
+                continue
+
+            # Hand every request back only its own slice of the results
+            start = 0
+            for request_items, future in requests:
+                future.set_result(results[start:start + len(request_items)])
+                start += len(request_items)
+
+    def _call(self, method, options, items):
+        """
+        Internal helper that runs one agent method on the items of one or more requests.
+
+        Parameters:
+        method (str): The agent method, e.g. 'predict'.
+        options (tuple): The sorted (name, value) keyword arguments of the method.
+        items (list): The strings, or (text, label) pairs for declutter.
+
+        Returns:
+        list: The result of every item.
+        """
+
+        if method == 'declutter':
+            return self.agent.declutter([text for text, _ in items], [label for _, label in items])
+        return getattr(self.agent, method)(items, **dict(options))
+
+    def close(self):
+        """
+        Stops the worker thread after the queued requests have been processed.
+        """
+
+        self._queue.put(None)
+        self._thread.join()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Reads JSON-lines requests from a connection and writes one response line per request.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.safaa.handle_request(line)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SafaaServer:
+    """
+    Serves SafaaAgent predictions over a Unix domain socket or a localhost TCP port.
+    """
+
+    def __init__(self, agent=None, socket_path=None, host='127.0.0.1', port=None,
+                 max_batch_size=1000, max_latency=0.01, **agent_kwargs):
+        """
+        Initializes the SafaaServer and loads the models.
+
+        Parameters:
+        agent (SafaaAgent): The agent to serve. Defaults to a new SafaaAgent built from agent_kwargs.
+        socket_path (str): Path of the Unix domain socket to listen on. Defaults to None.
+        host (str): Host to listen on when no socket path is given. Defaults to '127.0.0.1'.
+        port (int): TCP port to listen on when no socket path is given. Defaults to DEFAULT_PORT.
+        max_batch_size (int): Maximum number of strings per micro-batch. Defaults to 1000.
+        max_latency (float): Maximum seconds a request waits for a micro-batch to fill. Defaults to 0.01.
+        agent_kwargs: Keyword arguments passed to SafaaAgent when no agent is given.
+        """
+
+        # Keep every model resident for the lifetime of the server
+        self.agent = agent or SafaaAgent(**agent_kwargs)
+        self.agent._load_models()
+        self.batcher = MicroBatcher(self.agent, max_batch_size=max_batch_size, max_latency=max_latency)
+
+        if socket_path:
+            # Remove a socket left behind by a previous server
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self._server = _UnixServer(socket_path, _RequestHandler)
+        else:
+            self._server = _TCPServer((host, port or DEFAULT_PORT), _RequestHandler)
+        self._server.safaa = self
+        self.socket_path = socket_path
+
+    def handle_request(self, line):
+        """
+        Answers a single JSON-lines request.
+
+        Parameters:
+        line (bytes): The raw request line.
+
+        Returns:
+        dict: The response, with either a 'result' or an 'error' key.
+        """
+
+        try:
+            request = json.loads(line)
+            method = request.get('method')
+            if method == 'ping':
+                return {'result': 'pong'}
+            if method == 'reload':
+                self.agent.reload(wait=True)
+                return {'result': self.agent.model_dir}
+            if method not in METHODS:
+                raise ValueError(f"Unknown method: {method!r}")
+
+            data = [str(item) for item in request['data']]
+            if method == 'declutter':
+                predictions = request['predictions']
+                if len(predictions) != len(data):
+                    raise ValueError("data and predictions must have the same length")
+                future = self.batcher.submit(method, list(zip(data, predictions)))
+            else:
+                options = (('threshold', float(request.get('threshold', 0.5))),)
+                future = self.batcher.submit(method, data, options)
+            return {'result': future.result()}
+        except Exception as error:
+            return {'error': f"{type(error).__name__}: {error}"}
+
+    def serve_forever(self):
+        """
+        Serves requests until shutdown is called.
+        """
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.batcher.close()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        """
+        Stops serve_forever from another thread.
+        """
+
+        self._server.shutdown()
+
+
+def add_arguments(parser):
+    """
+    Adds the command line arguments of the server to a parser.
+    """
+
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Path of the Unix domain socket to listen on")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to listen on when --port is given")
+    parser.add_argument("--port", type=int, default=None, help="Listen on a localhost TCP port instead of a socket")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to serve")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Batch size used by the spaCy pipelines")
+    parser.add_argument("--max-batch-size", type=int, default=1000, help="Maximum number of strings per micro-batch")
+    parser.add_argument("--max-latency-ms", type=float, default=10.0,
+                        help="Maximum milliseconds a request waits for a micro-batch to fill")
+
+
+def main(args):
+    """
+    Runs the server from the parsed `python -m Safaa serve` arguments.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line arguments.
+    """
+
+    socket_path = None if args.port else args.socket
+    server = SafaaServer(
+        socket_path=socket_path,
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_latency=args.max_latency_ms / 1000,
+        model_dir=args.model_dir,
+        batch_size=args.batch_size,
+    )
+    print(f"Serving Safaa on {socket_path or f'{args.host}:{args.port}'}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,142 @@
+"""
+ResultStore: A persistent store of analyze results used to rescore uploads incrementally.
+"""
+
+import hashlib
+import sqlite3
+import threading
+
+
+class ResultStore:
+    """
+    Stores the analyze result of every string seen so far in an sqlite file.
+
+    Results are keyed on a hash of the text and belong to a single model version,
+    recorded in the meta table. When the version changes, e.g. because the models
+    were retrained, every stored result is dropped.
+    """
+
+    def __init__(self, path):
+        """
+        Opens or creates the store.
+
+        Parameters:
+        path (str): Path to the sqlite file.
+        """
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, prediction TEXT NOT NULL, probability REAL NOT NULL, decluttered TEXT NOT NULL)'
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(text):
+        """
+        Builds the key of a string.
+
+        Parameters:
+        text (str): The raw input string.
+
+        Returns:
+        str: The hex digest used as the key.
+        """
+
+        return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    @property
+    def model_version(self):
+        """
+        The model version the stored results belong to, or None for an empty store.
+        """
+
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE name = 'model_version'").fetchone()
+        return row[0] if row else None
+
+    def sync(self, model_version):
+        """
+        Drops every stored result if they belong to another model version.
+
+        Parameters:
+        model_version (str): The version of the models that will produce new results.
+
+        Returns:
+        bool: Whether the stored results were invalidated.
+        """
+
+        if self.model_version == model_version:
+            return False
+        with self._lock:
+            self._connection.execute('DELETE FROM results')
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('model_version', ?)", (model_version,)
+            )
+            self._connection.commit()
+        return True
+
+    def get_many(self, keys):
+        """
+        Looks up several keys at once.
+
+        Parameters:
+        keys (list): The keys to look up.
+
+        Returns:
+        dict: The (prediction, probability, decluttered) tuple of the keys that were found.
+        """
+
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._connection.execute(
+                    f'SELECT key, prediction, probability, decluttered FROM results '
+                    f'WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                ).fetchall()
+                for key, prediction, probability, decluttered in rows:
+                    found[key] = (prediction, probability, decluttered)
+        return found
+
+    def set_many(self, items):
+        """
+        Stores several results at once.
+
+        Parameters:
+        items (dict): Mapping from keys to (prediction, probability, decluttered) tuples.
+        """
+
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO results (key, prediction, probability, decluttered) VALUES (?, ?, ?, ?)',
+                [(key, *value) for key, value in items.items()]
+            )
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def clear(self):
+        """
+        Removes every stored result and the model version.
+        """
+
+        with self._lock:
+            self._connection.execute('DELETE FROM results')
+            self._connection.execute('DELETE FROM meta')
+            self._connection.commit()
+
+    def close(self):
+        """
+        Closes the sqlite file.
+        """
+
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -1,8 +1,10 @@
 from tqdm import tqdm
+import os
 import json
+import math
 import re
+import numpy as np
 import spacy
-from sklearn.model_selection import train_test_split
 
 def text_to_json(sentences):
     """
@@ -15,85 +17,151 @@ def text_to_json(sentences):
         new_json.append({'text': sentence, "labels": labels})
     return new_json
 
-def text_to_json_model_assisted(sentences, model):
+def text_to_json_model_assisted(sentences, model, batch_size=1000, n_process=1):
     """
-    Convert list of sentences to a JSON format using a model for predictions.
+    Convert sentences to a JSON format using a model for predictions.
+
+    The sentences are streamed through the model in batches with nlp.pipe, using
+    n_process worker processes, and the JSON items are yielded one at a time.
     """
-    sentences = model(sentences)
-    new_json = list()
-    for sentence in tqdm(sentences):
+    total = len(sentences) if hasattr(sentences, '__len__') else None
+    for sentence in tqdm(model.pipe(sentences, batch_size=batch_size, n_process=n_process), total=total):
         labels = list()
         for e in sentence.ents:  # Iterating through detected entities in the sentence
             # Appending start, end character positions and label of the entity
             labels.append([e.start_char, e.end_char, e.label_])
-        # Appending the sentence and its detected labels to the resulting JSON
-        new_json.append({'text': sentence.text, "labels": labels})
-    return new_json
+        # Yielding the sentence and its detected labels
+        yield {'text': sentence.text, "labels": labels}
 
 def text_to_json_labels_separate(sentences, labels, entity_name):
     """
     Convert list of sentences and labels to a JSON format with specific entity name.
     """
     new_json = list()
-    for sentence, label in tqdm(zip(sentences, labels)): 
+    for sentence, label in tqdm(zip(sentences, labels)):
         if label is None or label == '':
             continue  # If label is empty or None, skip the iteration
-        
+
         # Search for the exact match of the label in the sentence
         pattern = r"\b" + re.escape(label) + r"\b"
         match = re.search(pattern, sentence)
         if not match:
             continue  # If label is not found in the sentence, skip the iteration
-        
+
         # Appending the sentence and the position of its label to the resulting JSON
         new_json.append({'text': sentence, "labels": [match.start(), match.end(), entity_name]})
     return new_json
 
 def write_json_to_disk(new_json, path):
     """
-    Write a list of dictionaries in the JSONL format to disk.
+    Write an iterable of dictionaries in the JSONL format to disk.
     """
     with open(path, 'w') as f:
         for item in new_json:
             # Writing each dictionary in the list as a separate line in the JSONL file
             f.write(json.dumps(item) + '\n')
 
-def convert_jsonl_to_spacy(jsonl_path, spacy_path):
-    """
-    Load data from a JSONL file and convert it to spaCy's training format.
-    """
-    data = []
-    with open(jsonl_path, 'r') as f:
-        for line in f:
-            item = json.loads(line)
-            text = item['text']
-            # Extracting entities from the JSONL line
-            entities = [(e[0], e[1], e[2]) for e in item['labels']]
-            data.append((text, {'entities': entities}))
-    
-    nlp = spacy.blank('en')  # Creating a blank English NLP object
-    doc_bin = spacy.tokens.DocBin()  # Initializing a DocBin for efficient storage of `Doc` objects
-    for text, annotations in data:
-        doc = nlp.make_doc(text)  # Creating a `Doc` object from text
-        example = spacy.training.Example.from_dict(doc, annotations)  # Creating an example from the `Doc` and its annotations
-        doc_bin.add(example.reference)  # Adding the `Doc` to the DocBin
-    doc_bin.to_disk(spacy_path)  # Saving the DocBin to disk
-
-def spacy_train_test_split(file_path, split=0.2, random_state=42, shuffle=True):
+class ShardedDocBinWriter:
+    """
+    Write `Doc` objects to .spacy files without keeping more than one shard in memory.
+
+    Without a shard size every doc goes to a single file at path. With a shard size,
+    path is a directory of shard-00000.spacy, shard-00001.spacy, ... files holding at
+    most shard_size docs each, which spaCy's corpus reader accepts as a single corpus.
+    """
+    def __init__(self, path, shard_size=None):
+        self.path = path
+        self.shard_size = shard_size
+        self.paths = []
+        self.count = 0
+        self._doc_bin = spacy.tokens.DocBin()
+        if shard_size:
+            os.makedirs(path, exist_ok=True)
+
+    def add(self, doc):
+        self._doc_bin.add(doc)
+        self.count += 1
+        if self.shard_size and len(self._doc_bin) >= self.shard_size:
+            self._flush()
+
+    def _flush(self):
+        # Save the current shard to disk and start a new one
+        path = os.path.join(self.path, f'shard-{len(self.paths):05d}.spacy') if self.shard_size else self.path
+        self._doc_bin.to_disk(path)
+        self.paths.append(path)
+        self._doc_bin = spacy.tokens.DocBin()
+
+    def close(self):
+        # Save the last shard, or the single file even if it is empty
+        if len(self._doc_bin) or not self.paths:
+            self._flush()
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def spacy_file_paths(path):
+    """
+    List the .spacy files of a single file or a directory of shards.
+    """
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.spacy'))
+    return [path]
+
+def convert_jsonl_to_spacy(jsonl_path, spacy_path, shard_size=None):
+    """
+    Stream data from a JSONL file and convert it to spaCy's training format.
+
+    With a shard size, spacy_path becomes a directory of .spacy shards holding at
+    most shard_size docs each, so memory stays bounded for any corpus size.
+    Returns the paths of the written files.
+    """
+    with ShardedDocBinWriter(spacy_path, shard_size) as writer:
+        with open(jsonl_path, 'r') as f:
+            for line in f:
+                if writer.count % (shard_size or math.inf) == 0:
+                    # Creating a blank English NLP object per shard, so its vocab does not grow with the corpus
+                    nlp = spacy.blank('en')
+                item = json.loads(line)
+                # Extracting entities from the JSONL line
+                entities = [(e[0], e[1], e[2]) for e in item['labels']]
+                doc = nlp.make_doc(item['text'])  # Creating a `Doc` object from text
+                example = spacy.training.Example.from_dict(doc, {'entities': entities})  # Creating an example from the `Doc` and its annotations
+                writer.add(example.reference)  # Adding the `Doc` to the current shard
+    return writer.paths
+
+def spacy_train_test_split(file_path, split=0.2, random_state=42, shuffle=True, shard_size=None):
     """
     Split spaCy formatted data into training and testing sets.
+
+    file_path is a .spacy file or a directory of shards. Docs are assigned to a set
+    by their index, so only one shard is loaded at a time and no pretrained model is
+    needed. With a shard size the sets are written as directories of shards.
+    Returns the paths of the training and testing data.
     """
-    doc_bin = spacy.tokens.DocBin().from_disk(file_path)  # Loading the DocBin from disk
-    nlp = spacy.load("en_core_web_sm")  # Loading the English small core model
-    docs = list(doc_bin.get_docs(nlp.vocab))  # Retrieving `Doc` objects from the DocBin using the model's vocabulary
-    # Splitting the `Doc` objects into training and testing sets
-    train_docs, test_docs = train_test_split(docs, test_size=split, random_state=random_state, shuffle=shuffle)
-    train_doc_bin = spacy.tokens.DocBin(docs=train_docs)  # Creating a DocBin for training docs
-    test_doc_bin = spacy.tokens.DocBin(docs=test_docs)  # Creating a DocBin for testing docs
-    
-    # Deriving the paths for saving the training and testing DocBins
-    train_path = file_path.split('.spacy')[0] + '-train.spacy'
-    test_path = file_path.split('.spacy')[0] + '-test.spacy'
-
-    train_doc_bin.to_disk(train_path)  # Saving the training DocBin to disk
-    test_doc_bin.to_disk(test_path)  # Saving the testing DocBin to disk
+    paths = spacy_file_paths(file_path)
+
+    # Count the docs, then pick the test indices like scikit-learn's train_test_split
+    total = sum(len(spacy.tokens.DocBin().from_disk(path)) for path in paths)
+    test_count = math.ceil(total * split)
+    order = np.random.RandomState(random_state).permutation(total) if shuffle else np.arange(total)
+    is_test = np.zeros(total, dtype=bool)
+    is_test[order[:test_count]] = True
+
+    # Deriving the paths for saving the training and testing data
+    base_path = file_path[:-len('.spacy')] if file_path.endswith('.spacy') else file_path.rstrip(os.sep)
+    suffix = '' if shard_size else '.spacy'
+    train_path = base_path + '-train' + suffix
+    test_path = base_path + '-test' + suffix
+
+    index = 0
+    with ShardedDocBinWriter(train_path, shard_size) as train_writer, ShardedDocBinWriter(test_path, shard_size) as test_writer:
+        for path in paths:
+            # Loading one DocBin at a time and streaming its docs to the right set, with a fresh blank vocab each
+            for doc in spacy.tokens.DocBin().from_disk(path).get_docs(spacy.blank('en').vocab):
+                (test_writer if is_test[index] else train_writer).add(doc)
+                index += 1
+    return train_path, test_path
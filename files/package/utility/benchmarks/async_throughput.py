@@ -0,0 +1,82 @@
+import time
+import random
+import asyncio
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from argparse import ArgumentParser
+from Safaa.Safaa import *
+from Safaa.async_agent import AsyncSafaaAgent
+from Safaa.parallel import ParallelSafaaAgent
+
+async def run_concurrent(agent, requests):
+    """
+    Send every request from its own coroutine and check that each caller gets its own results back.
+    """
+    results = await asyncio.gather(*(agent.predict(request) for request in requests))
+    return results
+
+def main():
+    parser = ArgumentParser(description="Measure AsyncSafaaAgent throughput under many concurrent small requests")
+    parser.add_argument("--csv-file", required=True, help="Path to a CSV file whose first column holds the copyright strings")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="Number of concurrent requests")
+    parser.add_argument("--max-request-size", type=int, default=5, help="Maximum number of strings per request")
+    parser.add_argument("--max-batch-size", type=int, default=256, help="Maximum number of strings per micro-batch")
+    parser.add_argument("--max-latency-ms", type=float, default=5.0, help="Maximum milliseconds to wait for a micro-batch")
+    parser.add_argument("--executor", default="thread", choices=("thread", "process", "parallel"),
+                        help="Run the batches on a single thread, on a process pool with an agent per process, "
+                             "or on a single thread wrapping a ParallelSafaaAgent")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes of the process and parallel executors")
+
+    args = parser.parse_args()
+
+    rows = pd.read_csv(args.csv_file).iloc[:, 0].astype(str).to_list()
+    rng = random.Random(0)
+    requests = [rng.sample(rows, rng.randint(1, args.max_request_size)) for _ in range(args.requests)]
+    strings = sum(len(request) for request in requests)
+
+    agent = SafaaAgent(model_dir=args.model_dir)
+    agent._load_models()
+
+    # Baseline: every request calls the blocking agent on its own
+    start = time.perf_counter()
+    expected = [agent.predict(request) for request in requests]
+    blocking_time = time.perf_counter() - start
+
+    executor = None
+    options = {'max_batch_size': args.max_batch_size, 'max_latency': args.max_latency_ms / 1000}
+    if args.executor == 'process':
+        executor = ProcessPoolExecutor(args.workers)
+        options.update(executor=executor, model_dir=args.model_dir)
+    elif args.executor == 'parallel':
+        options['agent'] = ParallelSafaaAgent(workers=args.workers, model_dir=args.model_dir)
+    else:
+        options['agent'] = agent
+
+    async def run():
+        async with AsyncSafaaAgent(**options) as async_agent:
+            # Load the models of every worker process before timing
+            await asyncio.gather(*(async_agent.predict(request) for request in requests[:args.workers * 10]))
+            start = time.perf_counter()
+            return await run_concurrent(async_agent, requests), time.perf_counter() - start
+
+    try:
+        actual, async_time = asyncio.run(run())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if args.executor == 'parallel':
+            options['agent'].close()
+
+    print(f"Requests:          {len(requests)} ({strings} strings), {args.executor} executor")
+    print(f"Blocking requests: {strings / blocking_time:,.0f} strings/sec")
+    print(f"AsyncSafaaAgent:   {strings / async_time:,.0f} strings/sec")
+    print(f"Speedup:           {blocking_time / async_time:.2f}x")
+
+    # Every caller has to get back exactly its own results
+    if actual != expected:
+        print("AsyncSafaaAgent returned results that do not match the blocking agent")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
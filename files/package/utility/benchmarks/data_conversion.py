@@ -0,0 +1,96 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import resource
+import tempfile
+import multiprocessing
+from argparse import ArgumentParser
+from Safaa.bench import generate_corpus
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'NER'))
+from data_conversion import convert_jsonl_to_spacy, spacy_train_test_split, text_to_json_model_assisted, write_json_to_disk
+
+def write_corpus(path, size, chunk_size=100000):
+    """
+    Writes a labeled JSONL corpus of synthetic copyright strings, one chunk at a time.
+    """
+    year = re.compile(r'\d{4}')
+    with open(path, 'w') as f:
+        for start in range(0, size, chunk_size):
+            for sentence in generate_corpus(min(chunk_size, size - start), seed=start):
+                labels = [[match.start(), match.end(), 'ENT'] for match in year.finditer(sentence)]
+                f.write(json.dumps({'text': sentence, 'labels': labels}) + '\n')
+
+def label_with_model(jsonl_path, output_path, model_dir, size, n_process, batch_size):
+    """
+    Labels the first strings of the corpus with a spaCy model, streaming them from the JSONL file.
+    """
+    import spacy
+    from itertools import islice
+    nlp = spacy.load(model_dir)
+    with open(jsonl_path, 'r') as f:
+        sentences = (json.loads(line)['text'] for line in islice(f, size))
+        write_json_to_disk(text_to_json_model_assisted(sentences, nlp, batch_size=batch_size, n_process=n_process), output_path)
+
+def run_stage(results, function, *args):
+    """
+    Runs a stage and reports its wall time and the peak memory of the process running it.
+    """
+    start = time.perf_counter()
+    function(*args)
+    results.put((time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+def measure(function, *args):
+    """
+    Runs a stage in a fresh process, so the peak memory of every stage is measured on its own.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_stage, args=(results, function) + args)
+    process.start()
+    seconds, peak_memory = results.get()
+    process.join()
+    return seconds, peak_memory
+
+def main():
+    parser = ArgumentParser(description="Benchmark the streaming NER data conversion tools on a large corpus")
+    parser.add_argument("--size", type=int, default=3000000, help="Number of sentences in the corpus")
+    parser.add_argument("--shard-size", type=int, default=100000, help="Number of docs per .spacy shard")
+    parser.add_argument("--model-dir", default=None, help="spaCy model used to benchmark model-assisted labeling")
+    parser.add_argument("--label-size", type=int, default=20000, help="Number of sentences labeled with the model")
+    parser.add_argument("--n-process", default="1,2", help="Comma separated process counts for model-assisted labeling")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Batch size of nlp.pipe for model-assisted labeling")
+    parser.add_argument("--keep", default=None, help="Keep the generated files in this directory")
+
+    args = parser.parse_args()
+
+    directory = args.keep or tempfile.mkdtemp(prefix='safaa-ner-data-')
+    os.makedirs(directory, exist_ok=True)
+    jsonl_path = os.path.join(directory, 'corpus.jsonl')
+    spacy_path = os.path.join(directory, 'corpus')
+
+    try:
+        stages = [
+            ('generate jsonl', args.size, write_corpus, (jsonl_path, args.size)),
+            ('jsonl to spacy', args.size, convert_jsonl_to_spacy, (jsonl_path, spacy_path, args.shard_size)),
+            ('train/test split', args.size, spacy_train_test_split, (spacy_path, 0.2, 42, True, args.shard_size)),
+        ]
+        if args.model_dir:
+            for n_process in [int(count) for count in args.n_process.split(',')]:
+                stages.append((f'label n_process={n_process}', args.label_size, label_with_model,
+                               (jsonl_path, os.path.join(directory, 'labeled.jsonl'), args.model_dir,
+                                args.label_size, n_process, args.batch_size)))
+
+        print(f"{'stage':>22} {'sentences':>10} {'seconds':>9} {'sentences/s':>12} {'peak RSS MiB':>13}")
+        for name, size, function, stage_args in stages:
+            seconds, peak_memory = measure(function, *stage_args)
+            print(f"{name:>22} {size:>10,} {seconds:>9.1f} {size / seconds:>12,.0f} {peak_memory:>13.1f}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import time
+import tempfile
+import pandas as pd
+from argparse import ArgumentParser
+from Safaa.Safaa import SafaaAgent
+from Safaa.store import ResultStore
+
+def main():
+    parser = ArgumentParser(description="Measure rescoring a rescanned upload with the persistent result store")
+    parser.add_argument("--csv-file", required=True, help="Path to a CSV file whose first column holds the copyright strings")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to benchmark")
+    parser.add_argument("--size", type=int, default=10000, help="Number of strings in the upload")
+    parser.add_argument("--new-fraction", type=float, default=0.05, help="Fraction of strings that are new in the rescan")
+    parser.add_argument("--retrain-size", type=int, default=1000,
+                        help="Number of labeled rows, from the second column, the detector is retrained on before a last update")
+
+    args = parser.parse_args()
+
+    frame = pd.read_csv(args.csv_file)
+    rows = frame.iloc[:, 0].astype(str).to_list()
+    new_count = int(args.size * args.new_fraction)
+    first_scan = rows[:args.size]
+    rescan = rows[new_count:args.size + new_count]
+
+    with tempfile.TemporaryDirectory() as directory:
+        agent = SafaaAgent(model_dir=args.model_dir, result_store=ResultStore(os.path.join(directory, 'results.db')))
+        agent._load_models()
+
+        start = time.perf_counter()
+        agent.update(first_scan)
+        first_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = agent.update(rescan)
+        rescan_seconds = time.perf_counter() - start
+
+        # The merged results have to match analyzing the whole rescan from scratch
+        start = time.perf_counter()
+        expected = agent.analyze(rescan)
+        full_seconds = time.perf_counter() - start
+
+        # Retraining on inverted labels changes the predictions, so no stored result may be reused
+        retrain_rows = frame.iloc[:args.retrain_size]
+        agent.train_false_positive_detector_model(retrain_rows.iloc[:, 0].astype(str).to_list(),
+                                                  (1 - retrain_rows.iloc[:, 1]).to_list())
+        retrained_results = agent.update(rescan)
+        retrained_expected = agent.analyze(rescan)
+        agent.result_store.close()
+
+    print(f"Strings per scan:  {args.size} ({new_count} new in the rescan)")
+    print(f"First scan:        {first_seconds:.2f} s")
+    print(f"Rescan (update):   {rescan_seconds:.2f} s")
+    print(f"Rescan (analyze):  {full_seconds:.2f} s")
+    print(f"Speedup:           {full_seconds / rescan_seconds:.1f}x")
+    print(f"Results match:     {results == expected}")
+    print(f"Retrained match:   {retrained_results == retrained_expected}")
+
+    if results != expected or retrained_results != retrained_expected:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import time
+import pandas as pd
+from argparse import ArgumentParser
+from Safaa.Safaa import *
+
+def per_sentence_replace_entities(agent, data):
+    """
+    Reference implementation of entity masking that runs the entity recognizer one sentence at a time.
+    """
+    return [agent._mask_entities(agent.entity_recognizer(sentence)) for sentence in data]
+
+def main():
+    parser = ArgumentParser(description="Benchmark per-sentence and batched entity masking")
+    parser.add_argument("--csv-file", required=True, help="Path to a CSV file whose first column holds the copyright strings")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to benchmark")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Batch size used by nlp.pipe")
+    parser.add_argument("--n-process", type=int, default=1, help="Number of processes used by nlp.pipe")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N rows of the CSV file")
+
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.csv_file, nrows=args.limit).iloc[:, 0].astype(str).to_list()
+    agent = SafaaAgent(model_dir=args.model_dir, batch_size=args.batch_size, n_process=args.n_process)
+
+    # Time the per-sentence path
+    start = time.perf_counter()
+    expected = per_sentence_replace_entities(agent, data)
+    per_sentence_time = time.perf_counter() - start
+
+    # Time the batched path
+    start = time.perf_counter()
+    actual = agent._replace_entities(data)
+    batched_time = time.perf_counter() - start
+
+    # Both paths have to give the exact same output
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+
+    print(f"Sentences:    {len(data)}")
+    print(f"Per-sentence: {len(data) / per_sentence_time:,.0f} sentences/sec")
+    print(f"Batched:      {len(data) / batched_time:,.0f} sentences/sec "
+          f"(batch_size={args.batch_size}, n_process={args.n_process})")
+    print(f"Speedup:      {per_sentence_time / batched_time:.2f}x")
+    print(f"Mismatches:   {mismatches}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import time
+import resource
+import multiprocessing
+import pandas as pd
+from argparse import ArgumentParser
+
+def run_variant(results, model_dir, model_variant, texts, labels):
+    """
+    Loads a model variant and analyzes the held-out strings, reporting throughput, peak memory and F1.
+    """
+    from sklearn.metrics import f1_score
+    from Safaa.Safaa import SafaaAgent
+
+    agent = SafaaAgent(model_dir=model_dir, model_variant=model_variant)
+    start = time.perf_counter()
+    agent._load_models()
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analyzed = agent.analyze(texts)
+    seconds = time.perf_counter() - start
+
+    # Predictions are 'f' for false positives, which are labeled 1
+    predictions = [1 if prediction == 'f' else 0 for prediction, _, _ in analyzed]
+    results.put((
+        load_seconds, len(texts) / seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        f1_score(labels, predictions, average='macro'), agent._shares_tok2vec()
+    ))
+
+def measure(*args):
+    """
+    Runs a variant in a fresh process, so the peak memory of every variant is measured on its own.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_variant, args=(results,) + args)
+    process.start()
+    measurement = results.get()
+    process.join()
+    return measurement
+
+def main():
+    parser = ArgumentParser(description="Compare the accurate and the fast model variants side by side")
+    parser.add_argument("--csv-file", required=True, help="Held-out CSV file with the copyright strings and their labels")
+    parser.add_argument("--model-dir", default=None, help="Model directory holding both variants, see python -m Safaa export")
+    parser.add_argument("--text-column", default="text", help="Column holding the copyright strings")
+    parser.add_argument("--label-column", default="label", help="Column holding the labels, 1 for false positives")
+    parser.add_argument("--size", type=int, default=None, help="Number of held-out strings to use")
+
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.csv_file, nrows=args.size)
+    texts = data[args.text_column].astype(str).to_list()
+    labels = data[args.label_column].to_list()
+
+    print(f"Held-out strings: {len(texts)}")
+    print(f"{'variant':>9} {'load s':>7} {'sentences/s':>12} {'peak RSS MiB':>13} {'macro F1':>9} {'shared tok2vec':>15}")
+    for model_variant in ('accurate', 'fast'):
+        load_seconds, throughput, peak_memory, f1, shared = measure(args.model_dir, model_variant, texts, labels)
+        print(f"{model_variant:>9} {load_seconds:>7.2f} {throughput:>12,.0f} {peak_memory:>13.1f} {f1:>9.4f} {str(shared):>15}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import time
+import shutil
+import tempfile
+import threading
+from argparse import ArgumentParser
+from Safaa.Safaa import SafaaAgent
+from Safaa.bench import generate_corpus
+from Safaa.registry import ModelRegistry
+
+def serve(agent, data, stop, latencies, errors):
+    """
+    Keeps predicting batches like a busy server thread, recording the latency of every call.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            agent.predict(data)
+        except Exception as error:
+            errors.append(error)
+        latencies.append((start, time.perf_counter() - start))
+
+def main():
+    parser = ArgumentParser(description="Measure switching to a new model version while predictions keep running")
+    parser.add_argument("--model-dir", required=True, help="Directory holding the models of the first version")
+    parser.add_argument("--new-model-dir", default=None, help="Directory holding the models of the second version; defaults to --model-dir")
+    parser.add_argument("--threads", type=int, default=4, help="Number of threads predicting concurrently")
+    parser.add_argument("--batch", type=int, default=200, help="Number of strings per prediction call")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Time to run before and after the switch")
+
+    args = parser.parse_args()
+
+    registry_root = tempfile.mkdtemp(prefix='safaa-registry-')
+    try:
+        registry = ModelRegistry(registry_root)
+        registry.publish(args.model_dir, version='v1')
+        registry.publish(args.new_model_dir or args.model_dir, version='v2', activate=False)
+
+        agent = SafaaAgent(model_dir=registry_root)
+        agent._load_models()
+        data = generate_corpus(args.batch)
+
+        stop = threading.Event()
+        latencies, errors = [], []
+        threads = [threading.Thread(target=serve, args=(agent, data, stop, latencies, errors)) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+
+        # Switch to the second version while the threads keep predicting
+        switch_start = time.perf_counter()
+        registry.activate('v2')
+        agent.reload(wait=True)
+        switch_end = time.perf_counter()
+
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        shutil.rmtree(registry_root)
+
+    before = [latency for start, latency in latencies if start + latency < switch_start]
+    during = [latency for start, latency in latencies if start + latency >= switch_start and start < switch_end]
+    after = [latency for start, latency in latencies if start >= switch_end]
+    switched = agent.model_dir.endswith('v2')
+
+    print(f"Threads: {args.threads}, strings per call: {args.batch}")
+    print(f"Version switch time:         {switch_end - switch_start:.2f} s")
+    print(f"Calls before/during/after:   {len(before)}/{len(during)}/{len(after)}")
+    print(f"Max latency before switch:   {max(before, default=0):.3f} s")
+    print(f"Max latency during switch:   {max(during, default=0):.3f} s")
+    print(f"Max latency after switch:    {max(after, default=0):.3f} s")
+    print(f"Errors:                      {len(errors)}")
+    print(f"Serving v2:                  {switched}")
+
+    if errors or not switched:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import time
+import tempfile
+import tracemalloc
+import pandas as pd
+from itertools import cycle, islice
+from argparse import ArgumentParser
+from Safaa.Safaa import SafaaAgent
+
+def main():
+    parser = ArgumentParser(description="Show that incremental training keeps peak memory flat as the corpus grows")
+    parser.add_argument("--csv-file", required=True, help="Path to a CSV file with text and label columns")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the spaCy pipelines used for preprocessing")
+    parser.add_argument("--sizes", default="10000,40000", help="Comma separated corpus sizes to train on")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Number of rows trained on at a time")
+
+    args = parser.parse_args()
+
+    rows = pd.read_csv(args.csv_file, usecols=['text', 'label'])
+
+    print(f"{'rows':>8} {'rows/s':>8} {'peak MiB':>9}")
+    for size in [int(size) for size in args.sizes.split(',')]:
+        # Repeat the labeled rows until the corpus has the requested size
+        indices = list(islice(cycle(range(len(rows))), size))
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'corpus.csv')
+            rows.iloc[indices].to_csv(csv_path, index=False)
+
+            agent = SafaaAgent(model_dir=args.model_dir, feature_extraction='hashing')
+            agent._load_models()
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            agent.train_false_positive_detector_incrementally(csv_path, chunk_size=args.chunk_size)
+            seconds = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        print(f"{size:>8} {size / seconds:>8,.0f} {peak_memory / 2 ** 20:>9.1f}")
+
+if __name__ == "__main__":
+    main()
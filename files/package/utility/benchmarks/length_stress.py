@@ -0,0 +1,85 @@
+import time
+import random
+from argparse import ArgumentParser
+from Safaa.Safaa import SafaaAgent
+from Safaa.bench import generate_corpus
+
+LICENSE_PARAGRAPH = (
+    'Permission is hereby granted, free of charge, to any person obtaining a copy of this software and '
+    'associated documentation files (the "Software"), to deal in the Software without restriction. '
+    'Copyright (c) 2010 The Authors. '
+)
+
+def huge_strings(count, size, seed=0):
+    """
+    Generates megabyte-sized strings like the ones FOSSology sometimes extracts:
+    binary garbage such as embedded ICC profiles, and whole license texts.
+    """
+    rng = random.Random(seed)
+    strings = []
+    for index in range(count):
+        if index % 2:
+            strings.append((LICENSE_PARAGRAPH * (size // len(LICENSE_PARAGRAPH) + 1))[:size])
+        else:
+            garbage = bytes(rng.randrange(256) for _ in range(size)).decode('latin-1')
+            strings.append(('ICC_PROFILE (c) ' + garbage)[:size])
+    return strings
+
+def main():
+    parser = ArgumentParser(description="Stress the length guard and bucketing with a mix of tiny and huge strings")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to benchmark")
+    parser.add_argument("--size", type=int, default=5000, help="Number of tiny strings")
+    parser.add_argument("--huge-count", type=int, default=4, help="Number of huge strings mixed in")
+    parser.add_argument("--huge-size", type=int, default=1000000, help="Number of characters of every huge string")
+    parser.add_argument("--max-length", type=int, default=5000, help="The max_length limit to benchmark")
+    parser.add_argument("--include-unlimited", action="store_true",
+                        help="Also run without a limit; spaCy refuses strings over nlp.max_length (1,000,000 characters)")
+
+    args = parser.parse_args()
+
+    tiny = generate_corpus(args.size)
+    huge = huge_strings(args.huge_count, args.huge_size)
+
+    # Spread the huge strings over the corpus
+    data = list(tiny)
+    for index, string in enumerate(huge):
+        data.insert((index + 1) * len(data) // (len(huge) + 1), string)
+    huge_indices = {index for index, string in enumerate(data) if len(string) == args.huge_size}
+    tiny_positions = [index for index in range(len(data)) if index not in huge_indices]
+
+    # The results of the tiny strings on their own are the reference
+    reference = SafaaAgent(model_dir=args.model_dir).analyze(tiny)
+
+    modes = [('truncate', args.max_length), ('skip', args.max_length)]
+    if args.include_unlimited:
+        modes.append(('truncate', None))
+
+    print(f"Tiny strings: {len(tiny)}, huge strings: {len(huge)} x {args.huge_size:,} characters")
+    print(f"{'overflow':>9} {'max_length':>11} {'seconds':>9} {'strings/s':>10} {'tiny match':>11} {'huge results':>14}")
+    failed = False
+    for overflow, max_length in modes:
+        agent = SafaaAgent(model_dir=args.model_dir, max_length=max_length, overflow=overflow)
+        agent._load_models()
+
+        start = time.perf_counter()
+        try:
+            results = agent.analyze(data)
+        except Exception as error:
+            print(f"{overflow:>9} {str(max_length):>11} failed: {type(error).__name__}: {str(error)[:80]}")
+            continue
+        seconds = time.perf_counter() - start
+
+        # Every tiny string has to keep its result and its position
+        tiny_match = [results[index] for index in tiny_positions] == reference
+        huge_results = sorted({results[index][0] for index in huge_indices})
+        if overflow == 'skip':
+            tiny_match = tiny_match and all(results[index] == ('f', 1.0, '') for index in huge_indices)
+        failed = failed or not tiny_match
+        print(f"{overflow:>9} {str(max_length):>11} {seconds:>9.2f} {len(data) / seconds:>10,.0f} "
+              f"{str(tiny_match):>11} {','.join(huge_results):>14}")
+
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import multiprocessing
+from argparse import ArgumentParser
+from Safaa.Safaa import SafaaAgent
+
+def memory_usage():
+    """
+    Returns the resident and proportional set size of this process in MiB.
+
+    The proportional set size divides shared pages between the processes that map
+    them, so it shows how much memory memory-mapped models save across workers.
+    """
+    usage = {}
+    with open('/proc/self/smaps_rollup', 'r', encoding='utf-8') as file:
+        for line in file:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                usage[name] = int(value.split()[0]) / 1024
+    return usage['Rss'], usage['Pss']
+
+def load_and_predict(model_dir, model_format, data, barrier, results):
+    """
+    Loads the False Positive Detector and the Vectorizer, classifies the data and reports memory.
+    """
+    agent = SafaaAgent(model_dir=model_dir, model_format=model_format)
+
+    # Import scikit-learn up front so only the loading itself is timed
+    import sklearn.svm, sklearn.multiclass, sklearn.feature_extraction.text
+
+    start = time.perf_counter()
+    vectorizer = agent.vectorizer
+    false_positive_detector = agent.false_positive_detector
+    load_seconds = time.perf_counter() - start
+
+    false_positive_detector.predict_proba(vectorizer.transform(data))
+
+    # Measure once every worker holds the models
+    barrier.wait()
+    rss, pss = memory_usage()
+    results.put((load_seconds, rss, pss))
+    barrier.wait()
+
+def run_workers(model_dir, model_format, data, workers):
+    """
+    Starts the workers at once and averages their measurements.
+    """
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=load_and_predict, args=(model_dir, model_format, data, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return [sum(values) / len(values) for values in zip(*measurements)], sum(pss for _, _, pss in measurements)
+
+def main():
+    parser = ArgumentParser(description="Compare loading the pickled and the memory-mapped classifier models across workers")
+    parser.add_argument("--csv-file", required=True, help="Path to a CSV file whose first column holds the copyright strings")
+    parser.add_argument("--model-dir", required=True, help="Directory holding the pickled models")
+    parser.add_argument("--size", type=int, default=5000, help="Number of strings to classify")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes loading the models")
+
+    args = parser.parse_args()
+
+    agent = SafaaAgent(model_dir=args.model_dir, model_format='pickle')
+    data = agent._perform_text_substitutions(pd.read_csv(args.csv_file).iloc[:args.size, 0].astype(str).to_list())
+
+    # Export the pickles as memory-mapped artifacts; the spaCy pipelines are not needed here
+    mmap_dir = tempfile.mkdtemp(prefix='safaa-mmap-')
+    try:
+        agent.save(mmap_dir, model_format='mmap')
+        mapped = SafaaAgent(model_dir=mmap_dir, model_format='mmap')
+
+        # Both formats have to produce exactly the same features and probabilities
+        expected = agent.vectorizer.transform(data)
+        actual = mapped.vectorizer.transform(data)
+        feature_mismatches = (expected != actual).nnz
+        probabilities_equal = np.array_equal(
+            agent.false_positive_detector.predict_proba(expected),
+            mapped.false_positive_detector.predict_proba(actual)
+        )
+        del mapped
+
+        print(f"Workers: {args.workers}, strings: {len(data)}")
+        print(f"{'format':>7} {'load s':>8} {'RSS MiB':>9} {'PSS MiB':>9} {'total PSS MiB':>14}")
+        for model_format, model_dir in (('pickle', args.model_dir), ('mmap', mmap_dir)):
+            (load_seconds, rss, pss), total_pss = run_workers(model_dir, model_format, data, args.workers)
+            print(f"{model_format:>7} {load_seconds:>8.3f} {rss:>9.1f} {pss:>9.1f} {total_pss:>14.1f}")
+
+        print(f"Feature mismatches:   {feature_mismatches}")
+        print(f"Probabilities equal:  {probabilities_equal}")
+    finally:
+        shutil.rmtree(mmap_dir)
+
+    if feature_mismatches or not probabilities_equal:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import time
+import pandas as pd
+from itertools import cycle, islice
+from argparse import ArgumentParser
+from Safaa.parallel import ParallelSafaaAgent
+
+def main():
+    parser = ArgumentParser(description="Measure how predict and declutter throughput scales with the number of workers")
+    parser.add_argument("--csv-file", required=True, help="Path to a CSV file whose first column holds the copyright strings")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to benchmark")
+    parser.add_argument("--size", type=int, default=50000, help="Number of strings to process")
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma separated worker counts")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Number of strings sent to a worker at a time")
+
+    args = parser.parse_args()
+
+    rows = pd.read_csv(args.csv_file).iloc[:, 0].astype(str).to_list()
+    data = list(islice(cycle(rows), args.size))
+
+    print(f"{'workers':>8} {'predict/s':>12} {'scaling':>8} {'declutter/s':>12} {'scaling':>8}")
+    baseline = None
+    for workers in [int(count) for count in args.workers.split(',')]:
+        with ParallelSafaaAgent(workers=workers, chunk_size=args.chunk_size, model_dir=args.model_dir) as agent:
+            # Start the pool and load the models before timing
+            agent.predict(data[:workers * args.chunk_size])
+
+            start = time.perf_counter()
+            predictions = agent.predict(data)
+            predict_rate = len(data) / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            agent.declutter(data, predictions)
+            declutter_rate = len(data) / (time.perf_counter() - start)
+
+        baseline = baseline or (predict_rate, declutter_rate)
+        print(f"{workers:>8} {predict_rate:>12,.0f} {predict_rate / baseline[0]:>7.2f}x "
+              f"{declutter_rate:>12,.0f} {declutter_rate / baseline[1]:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import time
+import threading
+import pandas as pd
+from itertools import cycle, islice
+from argparse import ArgumentParser
+from Safaa.client import SafaaClient
+from Safaa.server import DEFAULT_SOCKET_PATH
+
+def percentile(values, fraction):
+    """
+    Return the value below which the given fraction of the sorted values fall.
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def main():
+    parser = ArgumentParser(description="Load test a running Safaa server (python -m Safaa serve)")
+    parser.add_argument("--csv-file", required=True, help="Path to a CSV file whose first column holds the copyright strings")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Path of the server's Unix domain socket")
+    parser.add_argument("--port", type=int, default=None, help="TCP port of the server, used instead of the socket")
+    parser.add_argument("--method", default="predict", choices=["predict", "analyze"], help="Method to call")
+    parser.add_argument("--clients", type=int, default=16, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=100, help="Number of requests sent by each client")
+    parser.add_argument("--request-size", type=int, default=10, help="Number of strings per request")
+
+    args = parser.parse_args()
+
+    rows = pd.read_csv(args.csv_file).iloc[:, 0].astype(str).to_list()
+    latencies = []
+    lock = threading.Lock()
+
+    def run_client(offset):
+        data = cycle(rows[offset:] + rows[:offset])
+        with SafaaClient(socket_path=args.socket, port=args.port) as client:
+            for _ in range(args.requests):
+                request = list(islice(data, args.request_size))
+                start = time.perf_counter()
+                getattr(client, args.method)(request)
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=run_client, args=(index * 997 % len(rows),)) for index in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"Requests:    {len(latencies)} x {args.request_size} strings from {args.clients} clients")
+    print(f"p50 latency: {percentile(latencies, 0.5) * 1000:.1f} ms")
+    print(f"p99 latency: {percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"Throughput:  {len(latencies) / elapsed:,.1f} requests/sec, "
+          f"{len(latencies) * args.request_size / elapsed:,.0f} strings/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import sys
+import json
+import subprocess
+from argparse import ArgumentParser
+
+# Modules that must not be imported by `import Safaa.Safaa`, they are loaded on first use
+HEAVY_MODULES = ['spacy', 'joblib', 'sklearn', 'pandas', 'pkg_resources']
+
+# Runs in a fresh interpreter so nothing is imported or cached beforehand
+STARTUP_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+from Safaa.Safaa import SafaaAgent
+import_time = time.perf_counter() - start
+heavy_modules = [name for name in {heavy_modules!r} if name in sys.modules]
+agent = SafaaAgent(model_dir={model_dir!r})
+agent.{method}(['Copyright (c) 2010 Free Software Foundation, Inc.'])
+first_prediction_time = time.perf_counter() - start
+print(json.dumps({{'import_time': import_time, 'first_prediction_time': first_prediction_time,
+                  'heavy_modules': heavy_modules}}))
+"""
+
+def measure(model_dir, method):
+    """
+    Measure the startup of the Safaa package in a fresh interpreter.
+    """
+    script = STARTUP_SCRIPT.format(heavy_modules=HEAVY_MODULES, model_dir=model_dir, method=method)
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', script],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = ArgumentParser(description="Measure import time and time-to-first-prediction of the Safaa package")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to load")
+    parser.add_argument("--method", default="predict", choices=["predict", "analyze"],
+                        help="Agent method used for the first prediction")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to average over")
+    parser.add_argument("--max-import-ms", type=float, default=100.0, help="Fail if the import takes longer")
+    parser.add_argument("--max-first-prediction-s", type=float, default=None,
+                        help="Fail if the first prediction takes longer")
+
+    args = parser.parse_args()
+
+    runs = [measure(args.model_dir, args.method) for _ in range(args.runs)]
+    import_time = min(run['import_time'] for run in runs)
+    first_prediction_time = min(run['first_prediction_time'] for run in runs)
+    heavy_modules = sorted({name for run in runs for name in run['heavy_modules']})
+
+    print(f"Import time:              {import_time * 1000:.1f} ms")
+    print(f"Time to first prediction: {first_prediction_time:.2f} s")
+    print(f"Heavy modules on import:  {', '.join(heavy_modules) or 'none'}")
+
+    # Guard against startup regressions
+    failures = []
+    if heavy_modules:
+        failures.append("importing Safaa.Safaa pulls in heavy modules")
+    if import_time * 1000 > args.max_import_ms:
+        failures.append(f"import time exceeds {args.max_import_ms} ms")
+    if args.max_first_prediction_s is not None and first_prediction_time > args.max_first_prediction_s:
+        failures.append(f"time to first prediction exceeds {args.max_first_prediction_s} s")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import resource
+import tracemalloc
+import pandas as pd
+from itertools import cycle, islice
+from argparse import ArgumentParser
+from Safaa.Safaa import *
+
+def measure_peak(function):
+    """
+    Run a function and return the peak memory in MiB allocated while it runs.
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+def current_rss():
+    """
+    Return the resident set size of the process in MiB, or its peak where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+def unique_strings(rows, size, run):
+    """
+    Yield size strings that are all distinct, so every one adds new tokens to the spaCy vocab.
+    """
+    for index, row in enumerate(islice(cycle(rows), size)):
+        yield f"{row} ref{run}x{index}"
+
+def vocab_size(agent):
+    """
+    Return the number of strings held by the string stores of both pipelines.
+    """
+    return len(agent.entity_recognizer.vocab.strings) + len(agent.declutter_model.vocab.strings)
+
+def main():
+    parser = ArgumentParser(description="Show how memory of predict and predict_iter grows with the number of distinct strings")
+    parser.add_argument("--csv-file", required=True, help="Path to a CSV file whose first column holds the copyright strings")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to benchmark")
+    parser.add_argument("--sizes", default="2000,4000,8000,16000", help="Comma separated input sizes")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk size used by predict_iter")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="Fail if the predict_iter peak of the largest input exceeds the smallest one by this factor")
+    parser.add_argument("--rss-tolerance", type=float, default=50.0,
+                        help="Fail if the RSS grows by more than this many MiB between the smallest and the largest input")
+
+    args = parser.parse_args()
+
+    rows = pd.read_csv(args.csv_file).iloc[:, 0].astype(str).to_list()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    agent = SafaaAgent(model_dir=args.model_dir)
+
+    # Warm up the models so their allocations are not counted
+    list(agent.predict_iter(rows[:args.chunk_size], chunk_size=args.chunk_size))
+    strings_before = vocab_size(agent)
+
+    # Stream every size first, since predict keeps the tokens of its input in the vocab
+    print(f"{'strings':>10} {'predict_iter MiB':>17} {'RSS MiB':>8} {'vocab strings':>14}")
+    streaming_peaks, rss = [], []
+    for run, size in enumerate(sizes):
+        streaming_peaks.append(measure_peak(lambda: sum(1 for _ in agent.predict_iter(
+            unique_strings(rows, size, run), chunk_size=args.chunk_size))))
+        rss.append(current_rss())
+        print(f"{size:>10} {streaming_peaks[-1]:>17.1f} {rss[-1]:>8.1f} {vocab_size(agent) - strings_before:>14}")
+    streaming_vocab = vocab_size(agent) - strings_before
+
+    print(f"\n{'strings':>10} {'predict MiB':>12} {'RSS MiB':>8} {'vocab strings':>14}")
+    for run, size in enumerate(sizes, len(sizes)):
+        # Both paths read the input from a generator, predict has to materialize it
+        list_peak = measure_peak(lambda: agent.predict(unique_strings(rows, size, run)))
+        print(f"{size:>10} {list_peak:>12.1f} {current_rss():>8.1f} {vocab_size(agent) - strings_before:>14}")
+
+    # The streaming peak, the RSS and the vocab have to stay flat as the input grows
+    failed = False
+    if streaming_peaks[-1] > streaming_peaks[0] * args.tolerance:
+        print("predict_iter peak memory grows with the input size")
+        failed = True
+    if rss[-1] - rss[0] > args.rss_tolerance:
+        print(f"predict_iter RSS grew by {rss[-1] - rss[0]:.1f} MiB")
+        failed = True
+    if streaming_vocab:
+        print(f"predict_iter left {streaming_vocab} strings in the spaCy vocab")
+        failed = True
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import re
+import time
+from argparse import ArgumentParser
+from Safaa.normalizer import TextNormalizer
+from Safaa.bench import generate_corpus
+
+# The substitutions exactly as they were applied before the precompiled normalizer
+LEGACY_SUBSTITUTIONS = [
+    (r'\d{4}', ' DATE '),
+    (r'\d+', ' '),
+    (r'©', ' COPYRIGHTSYMBOL '),
+    (r'\(c\)', ' COPYRIGHTSYMBOL '),
+    (r'\(C\)', ' COPYRIGHTSYMBOL '),
+    (r"""(?:[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*|"(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21\x23-\x5b\x5d-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])*")@(?:(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?|\[(?:(?:(2(5[0-5]|[0-4][0-9])|1[0-9][0-9]|[1-9]?[0-9]))\.){3}(?:(2(5[0-5]|[0-4][0-9])|1[0-9][0-9]|[1-9]?[0-9])|[a-z0-9-]*[a-z0-9]:(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21-\x5a\x53-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])+)\])""", ' EMAIL '),
+    (r'[^a-zA-Z0-9]', ' ')
+]
+
+# Hand-picked inputs covering the corner cases of every substitution
+GOLDEN_INPUTS = [
+    'Copyright (c) 2010 Free Software Foundation, Inc. <gnu@fsf.org>',
+    '(C) 1985-1995 Ian F. Darwin',
+    '© 2003, 2004 Jane Doe',
+    'Copyright 123456789 and 12 and 1',
+    'user1234@example.com and 1234@example.org',
+    'mail: "quoted local"@[192.168.0.1]',
+    'Ünïcödé © 名前 ٢٠٢٣ (c)(C)©',
+    '\x00\x01 binary \xff\xfe garbage ICC_PROFILE 0x7f',
+    '   ',
+    '',
+]
+
+def legacy_normalize(data):
+    """
+    Reference implementation that applies the substitutions one after another over the whole list.
+    """
+    for pattern, replacement in LEGACY_SUBSTITUTIONS:
+        data = [re.sub(pattern, replacement, sentence) for sentence in data]
+    return [sentence.lower().strip() for sentence in data]
+
+def main():
+    parser = ArgumentParser(description="Check and benchmark the precompiled text normalizer")
+    parser.add_argument("--size", type=int, default=200000, help="Number of synthetic copyright strings")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed used to generate the corpus")
+
+    args = parser.parse_args()
+
+    normalizer = TextNormalizer()
+
+    # The golden inputs have to match the legacy output exactly
+    golden_mismatches = [
+        sentence for sentence, expected in zip(GOLDEN_INPUTS, legacy_normalize(GOLDEN_INPUTS))
+        if normalizer.normalize(sentence) != expected
+    ]
+
+    corpus = generate_corpus(args.size, args.seed)
+
+    start = time.perf_counter()
+    expected = legacy_normalize(corpus)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = normalizer(corpus)
+    normalizer_time = time.perf_counter() - start
+
+    corpus_mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+
+    print(f"Strings:           {len(corpus)}")
+    print(f"Legacy loop:       {len(corpus) / legacy_time:,.0f} strings/sec")
+    print(f"Precompiled:       {len(corpus) / normalizer_time:,.0f} strings/sec")
+    print(f"Speedup:           {legacy_time / normalizer_time:.2f}x")
+    print(f"Golden mismatches: {len(golden_mismatches)}")
+    print(f"Corpus mismatches: {corpus_mismatches}")
+
+    for sentence in golden_mismatches:
+        print(f"  {sentence!r}")
+
+    if golden_mismatches or corpus_mismatches:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,126 @@
 import os
+import time
 import pandas as pd
 from argparse import ArgumentParser
 from Safaa.Safaa import *
-from sklearn.metrics import classification_report
+from Safaa.rules import RuleClassifier
+from sklearn.metrics import classification_report, f1_score
+
+def evaluate(agent, texts):
+    """
+    Predicts the held-out strings and returns the predicted labels and the throughput.
+    """
+    start = time.perf_counter()
+    predictions = agent.predict(texts)
+    throughput = len(texts) / (time.perf_counter() - start)
+
+    # Predictions are 'f' for false positives, which are labeled 1
+    return [1 if prediction == 'f' else 0 for prediction in predictions], throughput
+
+def check_rules(agent_kwargs, texts, labels, rules):
+    """
+    Predicts the held-out strings with and without the rules and checks that no prediction gets worse.
+    """
+    model_predictions, model_throughput = evaluate(SafaaAgent(**agent_kwargs), texts)
+    agent = SafaaAgent(rules=rules, **agent_kwargs)
+    rule_predictions, rule_throughput = evaluate(agent, texts)
+
+    worse = sum(model == label and rule != label for model, rule, label in zip(model_predictions, rule_predictions, labels))
+    better = sum(model != label and rule == label for model, rule, label in zip(model_predictions, rule_predictions, labels))
+
+    print(classification_report(labels, rule_predictions))
+    print(f"{'stage':>8} {'decided':>8}")
+    for stage, fraction in sorted(agent.decision_fractions().items()):
+        print(f"{stage:>8} {fraction:>8.1%}")
+    print(f"Macro F1 without/with rules:  {f1_score(labels, model_predictions, average='macro'):.4f}/"
+          f"{f1_score(labels, rule_predictions, average='macro'):.4f}")
+    print(f"Predict/s without/with rules: {model_throughput:,.0f}/{rule_throughput:,.0f}")
+    print(f"Predictions worse/better:     {worse}/{better}")
+    return worse == 0
 
 def main():
     parser = ArgumentParser(description="Read CSV file and check model file")
-    parser.add_argument("--csv-file", help="Path to the CSV file - it should two columns: text and label")
+    parser.add_argument("--csv-file", required=True, help="Path to the held-out CSV file - it should two columns: text and label")
+    parser.add_argument("--train-csv-file", default=None,
+                        help="Train on this CSV file with every feature extraction mode and compare them on --csv-file")
+    parser.add_argument("--model-dir", default=None, help="Directory holding the models to start from")
+    parser.add_argument("--n-features", type=int, default=2 ** 20, help="Number of hashed features of the hashing vectorizer")
+    parser.add_argument("--text-column", default="text", help="Column holding the copyright strings")
+    parser.add_argument("--label-column", default="label", help="Column holding the labels, 1 for false positives")
+    parser.add_argument("--rules", action="store_true",
+                        help="Check that the rule-based pre-classifier makes no prediction worse than the models alone")
+    parser.add_argument("--rules-csv-file", default=None,
+                        help="Labeled CSV file, with the --text-column and --label-column columns, used as the table of known verdicts")
 
     args = parser.parse_args()
-    
+
     # Read the CSV file using Pandas
     try:
-        data = pd.read_csv(args.csv_file_path)
-        print(f"Successfully read the CSV file from: {args.csv_file_path}")
+        data = pd.read_csv(args.csv_file)
+        print(f"Successfully read the CSV file from: {args.csv_file}")
     except FileNotFoundError:
-        print(f"CSV file not found at: {args.csv_file_path}")
+        print(f"CSV file not found at: {args.csv_file}")
+        return
+    texts = data[args.text_column].astype(str).to_list()
+    labels = data[args.label_column].to_list()
+
+    if args.rules:
+        rules = RuleClassifier()
+        if args.rules_csv_file:
+            rules = RuleClassifier.from_csv(args.rules_csv_file, text_column=args.text_column, label_column=args.label_column)
+        if not check_rules({'model_dir': args.model_dir}, texts, labels, rules):
+            raise SystemExit(1)
         return
-    
-    # Check if the Safaa package is installed in the fossy user pythondeps
-    # Simply check if a directory containing Safaa is inside /home/fossy/pythondeps
-    dirs = os.listdir('/home/fossy/pythondeps')
-    dirs = [d for d in dirs if 'Safaa' in d]
-
-    if len(dirs) == 0:
-        print("""The Safaa package is not installed in the fossy user pythondeps. 
-                Please install by running the post-install script with the --python-experimental flag""")
+
+    if args.train_csv_file is None:
+        # Check if the Safaa package is installed in the fossy user pythondeps
+        # Simply check if a directory containing Safaa is inside /home/fossy/pythondeps
+        dirs = os.listdir('/home/fossy/pythondeps')
+        dirs = [d for d in dirs if 'Safaa' in d]
+
+        if len(dirs) == 0:
+            print("""The Safaa package is not installed in the fossy user pythondeps.
+                    Please install by running the post-install script with the --python-experimental flag""")
+            return
+
+        # Create an instance of the class
+        agent = SafaaAgent()
+
+        predictions, _ = evaluate(agent, texts)
+
+        # Print the predictions
+        print(classification_report(labels, predictions))
         return
-    
-    # Create an instance of the class
-    agent = SafaaAgent()
-    
-    predictions = agent.predict(data['text'].to_list())
-
-    # Print the predictions
-    print(classification_report(data['label'].to_list(), predictions))
+
+    train_data = pd.read_csv(args.train_csv_file)
+    train_texts = train_data[args.text_column].astype(str).to_list()
+    train_labels = train_data[args.label_column].to_list()
+
+    # Train and evaluate the same classifier on top of each feature extraction mode
+    results = []
+    for feature_extraction in ('tfidf', 'hashing'):
+        agent = SafaaAgent(model_dir=args.model_dir, feature_extraction=feature_extraction, n_features=args.n_features)
+
+        start = time.perf_counter()
+        agent.train_false_positive_detector_model(train_texts, train_labels)
+        train_seconds = time.perf_counter() - start
+
+        # Vectorization alone shows the cost of the vocabulary lookups
+        preprocessed = agent.preprocess_data(texts)
+        start = time.perf_counter()
+        agent.vectorizer.transform(preprocessed)
+        vectorization_throughput = len(texts) / (time.perf_counter() - start)
+
+        predictions, throughput = evaluate(agent, texts)
+
+        print(f"Feature extraction: {feature_extraction}")
+        print(classification_report(labels, predictions))
+        results.append((feature_extraction, f1_score(labels, predictions, average='macro'),
+                        train_seconds, vectorization_throughput, throughput))
+
+    print(f"{'mode':>8} {'macro F1':>9} {'train s':>8} {'vectorize/s':>12} {'predict/s':>10}")
+    for feature_extraction, f1, train_seconds, vectorization_throughput, throughput in results:
+        print(f"{feature_extraction:>8} {f1:>9.4f} {train_seconds:>8.1f} {vectorization_throughput:>12,.0f} {throughput:>10,.0f}")
 
 if __name__ == "__main__":
     main()
@@ -5,33 +5,46 @@ from Safaa.Safaa import *
 
 def main():
     parser = ArgumentParser(description="Read CSV file and check model file")
-    parser.add_argument("--csv-file", help="Path to the CSV file - it should two columns: text and label")
+    parser.add_argument("--csv-file", required=True, help="Path to the CSV file - it should two columns: text and label")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Stream the CSV file in chunks and train with partial_fit on hashed features")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Number of rows trained on at a time with --incremental")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file to write and resume from with --incremental")
+    parser.add_argument("--n-features", type=int, default=2 ** 20, help="Number of hashed features with --incremental")
+    parser.add_argument("--output-dir", default=None, help="Directory to save the trained model to")
 
     args = parser.parse_args()
-    
-    # Read the CSV file using Pandas
-    try:
-        data = pd.read_csv(args.csv_file_path)
-        print(f"Successfully read the CSV file from: {args.csv_file_path}")
-    except FileNotFoundError:
-        print(f"CSV file not found at: {args.csv_file_path}")
+
+    if not os.path.exists(args.csv_file):
+        print(f"CSV file not found at: {args.csv_file}")
         return
-    
+
     # Check if the Safaa package is installed in the fossy user pythondeps
     # Simply check if a directory containing Safaa is inside /home/fossy/pythondeps
     dirs = os.listdir('/home/fossy/pythondeps')
     dirs = [d for d in dirs if 'Safaa' in d]
 
     if len(dirs) == 0:
-        print("""The Safaa package is not installed in the fossy user pythondeps. 
+        print("""The Safaa package is not installed in the fossy user pythondeps.
                 Please install by running the post-install script with the --python-experimental flag""")
         return
 
-    agent = SafaaAgent()
+    if args.incremental:
+        # Only one chunk of the CSV file is held in memory at a time
+        agent = SafaaAgent(feature_extraction='hashing', n_features=args.n_features)
+        agent.train_false_positive_detector_incrementally(
+            args.csv_file, chunk_size=args.chunk_size, checkpoint_path=args.checkpoint
+        )
+    else:
+        # Read the CSV file using Pandas
+        data = pd.read_csv(args.csv_file)
+        print(f"Successfully read the CSV file from: {args.csv_file}")
+
+        agent = SafaaAgent()
 
-    agent.train_false_positive_detector_model(data['text'].to_list(), data['label'].to_list())
+        agent.train_false_positive_detector_model(data['text'].to_list(), data['label'].to_list())
 
-    agent.save()
+    agent.save(args.output_dir)
 
 if __name__ == "__main__":
     main()